@@ -1,5 +1,12 @@
 -- Create external table for raw telemetry
 -- Run this if Glue crawler doesn't automatically create the table
+--
+-- Only JSON envelopes belong in this table. Binary sample frames (*.f1tf,
+-- e.g. data_type=car_telemetry) share the raw-telemetry/ prefix, so that
+-- partition is left out of the projected data types, and malformed JSON is
+-- skipped in case a frame lands in a projected partition. Manifests
+-- (_manifest.json, _manifest/) are hidden from Athena by their leading
+-- underscore.
 
 CREATE EXTERNAL TABLE IF NOT EXISTS f1_telemetry.raw_telemetry (
   timestamp STRING,
@@ -49,6 +56,7 @@ PARTITIONED BY (
   data_type_partition STRING
 )
 ROW FORMAT SERDE 'org.openx.data.jsonserde.JsonSerDe'
+WITH SERDEPROPERTIES ('ignore.malformed.json' = 'true')
 LOCATION 's3://f1-telemetry-<ENVIRONMENT>-raw-telemetry/raw-telemetry/'
 TBLPROPERTIES (
   'projection.enabled' = 'true',
@@ -0,0 +1,60 @@
+-- Create external tables for the rollups written by the ingestion service
+-- Rollup objects are JSON Lines. Each replica writes its own traffic objects,
+-- so sum traffic rows across writers when querying. Lap stats are merged
+-- across replicas into one object per race, so they need no deduplication
+
+CREATE EXTERNAL TABLE IF NOT EXISTS f1_telemetry.traffic_rollups (
+  minute STRING,
+  edge_id STRING,
+  data_type STRING,
+  messages BIGINT,
+  bytes BIGINT,
+  samples BIGINT
+)
+PARTITIONED BY (
+  year INT,
+  month INT,
+  day INT,
+  hour INT
+)
+ROW FORMAT SERDE 'org.openx.data.jsonserde.JsonSerDe'
+LOCATION 's3://f1-telemetry-<ENVIRONMENT>-raw-telemetry/rollups/traffic/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.year.type' = 'integer',
+  'projection.year.range' = '2024,2030',
+  'projection.month.type' = 'integer',
+  'projection.month.range' = '1,12',
+  'projection.month.digits' = '2',
+  'projection.day.type' = 'integer',
+  'projection.day.range' = '1,31',
+  'projection.day.digits' = '2',
+  'projection.hour.type' = 'integer',
+  'projection.hour.range' = '0,23',
+  'projection.hour.digits' = '2',
+  'storage.location.template' = 's3://f1-telemetry-<ENVIRONMENT>-raw-telemetry/rollups/traffic/year=${year}/month=${month}/day=${day}/hour=${hour}'
+);
+
+CREATE EXTERNAL TABLE IF NOT EXISTS f1_telemetry.lap_stats_rollups (
+  driver_id STRING,
+  stint INT,
+  laps INT,
+  min_lap_s DOUBLE,
+  max_lap_s DOUBLE,
+  mean_lap_s DOUBLE,
+  generation BIGINT
+)
+PARTITIONED BY (
+  season STRING,
+  round STRING
+)
+ROW FORMAT SERDE 'org.openx.data.jsonserde.JsonSerDe'
+LOCATION 's3://f1-telemetry-<ENVIRONMENT>-raw-telemetry/rollups/lap_stats/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.season.type' = 'integer',
+  'projection.season.range' = '2024,2030',
+  'projection.round.type' = 'integer',
+  'projection.round.range' = '1,30',
+  'storage.location.template' = 's3://f1-telemetry-<ENVIRONMENT>-raw-telemetry/rollups/lap_stats/season=${season}/round=${round}'
+);
@@ -0,0 +1,33 @@
+-- Data quality checks from ingest-time rollups
+-- Same checks as data_quality.sql without scanning raw-telemetry/
+
+WITH data_summary AS (
+  SELECT
+    date_trunc('day', from_iso8601_timestamp(minute)) as day,
+    data_type,
+    edge_id,
+    SUM(messages) as record_count,
+    SUM(bytes) as total_bytes,
+    COUNT(DISTINCT substr(minute, 1, 13)) as hours_with_data
+  FROM f1_telemetry.traffic_rollups
+  WHERE year = 2025
+    AND month = 12
+  GROUP BY
+    date_trunc('day', from_iso8601_timestamp(minute)),
+    data_type,
+    edge_id
+)
+SELECT
+  day,
+  data_type,
+  edge_id,
+  record_count,
+  total_bytes,
+  hours_with_data,
+  CASE
+    WHEN hours_with_data < 20 THEN 'WARNING: Gaps in data'
+    WHEN record_count < 10 THEN 'WARNING: Low record count'
+    ELSE 'OK'
+  END as status
+FROM data_summary
+ORDER BY day DESC, data_type, edge_id;
@@ -0,0 +1,527 @@
+"""
+F1 Telemetry Local Query Engine
+Runs the Athena analyses against raw-telemetry partitions on any S3-compatible
+endpoint (AWS S3, MinIO) or a local directory, without Glue or Athena
+"""
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import logging
+import threading
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterable
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stderr
+)
+logger = logging.getLogger(__name__)
+
+RAW_PREFIX = "raw-telemetry/"
+# Ingestion manifests: the compacted partition manifest, and the per-writer/hour
+# shards written since it was compacted
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_DIR = "_manifest/"
+PARTITION_LEVELS = ("year", "month", "day", "data_type")
+
+
+@dataclass(frozen=True)
+class PartitionFilter:
+    """Partition predicate evaluated on key paths, so pruned partitions are never listed"""
+    year: Optional[int] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+    data_types: Optional[Tuple[str, ...]] = None
+
+    def allows(self, level: str, value: str) -> bool:
+        if level == "data_type":
+            return self.data_types is None or value in self.data_types
+        wanted = getattr(self, level)
+        try:
+            return wanted is None or int(value) == wanted
+        except ValueError:
+            return False
+
+
+@dataclass(frozen=True)
+class ObjectRef:
+    """A stored telemetry object; version changes whenever the content does"""
+    key: str
+    size: int
+    version: str
+
+
+class LocalSource:
+    """Reads a raw-telemetry tree from a local directory (e.g. an `aws s3 sync` copy)"""
+
+    cacheable = False
+
+    def __init__(self, root: str):
+        self.root = root
+        self.name = f"file://{os.path.abspath(root)}"
+
+    def list_dirs(self, prefix: str) -> List[str]:
+        path = os.path.join(self.root, prefix)
+        if not os.path.isdir(path):
+            return []
+        return [f"{prefix}{entry.name}/" for entry in os.scandir(path) if entry.is_dir()]
+
+    def list_objects(self, prefix: str) -> List[ObjectRef]:
+        path = os.path.join(self.root, prefix)
+        refs = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if f"{d}/" != MANIFEST_DIR]
+            for filename in filenames:
+                if filename == MANIFEST_NAME:
+                    continue
+                full = os.path.join(dirpath, filename)
+                stat = os.stat(full)
+                key = os.path.relpath(full, self.root).replace(os.sep, "/")
+                refs.append(ObjectRef(key=key, size=stat.st_size, version=str(stat.st_mtime_ns)))
+        return refs
+
+    def list_manifests(self, prefix: str) -> Dict[str, str]:
+        # Shards are single-part uploads, so the MD5 of a synced copy is its S3 ETag
+        path = os.path.join(self.root, prefix, MANIFEST_DIR)
+        versions = {}
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                with open(full, "rb") as f:
+                    digest = hashlib.md5(f.read()).hexdigest()
+                versions[os.path.relpath(full, self.root).replace(os.sep, "/")] = digest
+        return versions
+
+    def read_optional(self, key: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.root, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class S3Source:
+    """Reads a raw-telemetry tree from an S3 bucket or S3-compatible endpoint"""
+
+    cacheable = True
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: str = "us-east-1"):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.name = f"s3://{bucket}" + (f"@{endpoint_url}" if endpoint_url else "")
+        client_kwargs: Dict[str, Any] = {
+            "region_name": region,
+            # Enough connections for the parallel fetch pool
+            "config": Config(max_pool_connections=64),
+        }
+        if endpoint_url:
+            client_kwargs.update(
+                endpoint_url=endpoint_url,
+                aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", "minioadmin"),
+                aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "minioadmin"),
+            )
+        self.s3_client = boto3.client("s3", **client_kwargs)
+
+    def list_dirs(self, prefix: str) -> List[str]:
+        dirs = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            dirs.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        return dirs
+
+    def list_objects(self, prefix: str) -> List[ObjectRef]:
+        refs = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith(f"/{MANIFEST_NAME}") or f"/{MANIFEST_DIR}" in obj["Key"]:
+                    continue
+                refs.append(ObjectRef(key=obj["Key"], size=obj["Size"], version=obj["ETag"].strip('"')))
+        return refs
+
+    def list_manifests(self, prefix: str) -> Dict[str, str]:
+        versions = {}
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{prefix}{MANIFEST_DIR}"):
+            versions.update((obj["Key"], obj["ETag"].strip('"')) for obj in page.get("Contents", []))
+        return versions
+
+    def read_optional(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+
+class ObjectCache:
+    """Small on-disk cache of fetched objects, evicting least recently used first"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file()
+        )
+
+    def _path(self, source_name: str, ref: ObjectRef) -> str:
+        digest = hashlib.sha256(f"{source_name}\0{ref.key}\0{ref.version}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest)
+
+    def get(self, source_name: str, ref: ObjectRef) -> Optional[bytes]:
+        path = self._path(source_name, ref)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def put(self, source_name: str, ref: ObjectRef, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(source_name, ref)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.total_bytes += len(data)
+
+    def evict(self):
+        """Trim the cache back under max_bytes"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        entries = sorted(
+            (e for e in os.scandir(self.cache_dir) if e.is_file()),
+            key=lambda e: e.stat().st_mtime
+        )
+        self.total_bytes = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            os.remove(entry.path)
+            self.total_bytes -= size
+
+
+@dataclass
+class ScanStats:
+    partitions: int = 0
+    manifests: int = 0
+    listed: int = 0
+    objects: int = 0
+    bytes: int = 0
+    cache_hits: int = 0
+    skipped: int = 0
+
+
+class TelemetryScanner:
+    """Prunes partitions, then fetches and parses matching objects in parallel"""
+
+    def __init__(
+        self,
+        source,
+        cache: Optional[ObjectCache] = None,
+        workers: int = 32,
+        use_manifests: bool = True
+    ):
+        self.source = source
+        self.cache = cache if source.cacheable else None
+        self.workers = workers
+        self.use_manifests = use_manifests
+        self.stats = ScanStats()
+        self._stats_lock = threading.Lock()
+
+    def _leaf_partitions(self, partitions: PartitionFilter) -> List[str]:
+        prefixes = [RAW_PREFIX]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for level in PARTITION_LEVELS:
+                children = pool.map(self.source.list_dirs, prefixes)
+                prefixes = []
+                for child_dirs in children:
+                    for child in child_dirs:
+                        name = child.rstrip("/").rsplit("/", 1)[-1]
+                        if "=" not in name:
+                            continue
+                        key, value = name.split("=", 1)
+                        if key == level and partitions.allows(level, value):
+                            prefixes.append(child)
+        return prefixes
+
+    def _list_partition(self, prefix: str) -> List[ObjectRef]:
+        """
+        Plan a partition's objects. With use_manifests the compacted manifest
+        is authoritative: it is read with one GET, and only the shards whose
+        ETag differs from the one it recorded when they were folded in (those
+        written since) are read on top. Partitions without manifests, or every
+        partition without use_manifests, are listed.
+        """
+        if self.use_manifests:
+            refs = self._manifest_refs(prefix)
+            if refs is not None:
+                with self._stats_lock:
+                    self.stats.manifests += 1
+                return refs
+
+        with self._stats_lock:
+            self.stats.listed += 1
+        return self.source.list_objects(prefix)
+
+    def _manifest_refs(self, prefix: str) -> Optional[List[ObjectRef]]:
+        """Objects indexed by the partition's manifest and newer shards, or None if it has neither"""
+        data = self.source.read_optional(f"{prefix}{MANIFEST_NAME}")
+        manifest = json.loads(data) if data is not None else {}
+        folded = manifest.get("shards", {})
+        changed = [key for key, version in self.source.list_manifests(prefix).items() if folded.get(key) != version]
+        if data is None and not changed:
+            return None
+
+        documents = [manifest] + [json.loads(shard) for shard in map(self.source.read_optional, changed) if shard]
+        rows: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            columns = document.get("columns", [])
+            for row in document.get("objects", []):
+                values = dict(zip(columns, row))
+                rows[values["key"]] = values
+
+        return [
+            ObjectRef(
+                key=f"{prefix}{name}",
+                size=values["bytes"],
+                # Entries written before ETags were recorded fall back to size and time range
+                version=values.get("etag") or f"{values['bytes']}@{values['min_ts']}/{values['max_ts']}"
+            )
+            for name, values in rows.items()
+        ]
+
+    def _load(self, ref: ObjectRef) -> Optional[Dict[str, Any]]:
+        data = self.cache.get(self.source.name, ref) if self.cache else None
+        cached = data is not None
+        if not cached:
+            # Manifests may still index objects removed since (e.g. by a lifecycle rule)
+            data = self.source.read_optional(ref.key)
+            if data is None:
+                with self._stats_lock:
+                    self.stats.skipped += 1
+                return None
+            if self.cache:
+                self.cache.put(self.source.name, ref, data)
+
+        with self._stats_lock:
+            self.stats.bytes += len(data)
+            self.stats.cache_hits += cached
+
+        try:
+            document = json.loads(data)
+            return {
+                "timestamp": document["timestamp"],
+                "edge_id": document["edge_id"],
+                "data_type": document["data_type"],
+                "size": len(data),
+            }
+        except (ValueError, KeyError, TypeError):
+            with self._stats_lock:
+                self.stats.skipped += 1
+            return None
+
+    def scan(self, partitions: PartitionFilter) -> List[Dict[str, Any]]:
+        leaves = self._leaf_partitions(partitions)
+        self.stats.partitions = len(leaves)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            refs = [ref for refs in pool.map(self._list_partition, leaves) for ref in refs]
+            # Binary sample frames (.f1tf) are not envelope documents
+            refs = [ref for ref in refs if ref.key.endswith(".json")]
+            self.stats.objects = len(refs)
+            records = [r for r in pool.map(self._load, refs) if r is not None]
+
+        if self.cache:
+            self.cache.evict()
+        return records
+
+
+def _parse_ts(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+
+def _collection_summary(records: Iterable[Dict[str, Any]], data_type: str) -> Dict[Tuple[str, str], List[str]]:
+    groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+    for record in records:
+        if record["data_type"] == data_type:
+            race_date = _parse_ts(record["timestamp"]).strftime("%Y-%m-%d")
+            groups[(race_date, record["edge_id"])].append(record["timestamp"])
+    return groups
+
+
+def query_lap_times(records: List[Dict[str, Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Equivalent of athena/queries/lap_times_analysis.sql"""
+    groups = _collection_summary(records, "lap_times")
+    rows = [
+        [race_date, edge_id, len(ts), min(ts), max(ts)]
+        for (race_date, edge_id), ts in groups.items()
+    ]
+    rows.sort(key=lambda r: r[1])
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return ["race_date", "edge_id", "total_records", "first_collection", "last_collection"], rows
+
+
+def query_pit_stops(records: List[Dict[str, Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Equivalent of athena/queries/pit_stop_analysis.sql"""
+    groups = _collection_summary(records, "pit_stops")
+    rows = []
+    for (race_date, edge_id), ts in groups.items():
+        first, last = min(ts), max(ts)
+        duration = int((_parse_ts(last) - _parse_ts(first)).total_seconds())
+        rows.append([race_date, edge_id, len(ts), first, last, duration])
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return [
+        "race_date", "edge_id", "pit_stop_records",
+        "first_collection", "last_collection", "collection_duration_seconds"
+    ], rows
+
+
+def query_data_quality(records: List[Dict[str, Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Equivalent of athena/queries/data_quality.sql"""
+    counts: Dict[Tuple[str, str, str], int] = defaultdict(int)
+    hours: Dict[Tuple[str, str, str], set] = defaultdict(set)
+    for record in records:
+        ts = _parse_ts(record["timestamp"])
+        key = (ts.strftime("%Y-%m-%d"), record["data_type"], record["edge_id"])
+        counts[key] += 1
+        hours[key].add(ts.hour)
+
+    rows = []
+    for (day, data_type, edge_id), record_count in counts.items():
+        hours_with_data = len(hours[(day, data_type, edge_id)])
+        if hours_with_data < 20:
+            status = "WARNING: Gaps in data"
+        elif record_count < 10:
+            status = "WARNING: Low record count"
+        else:
+            status = "OK"
+        rows.append([day, data_type, edge_id, record_count, hours_with_data, status])
+    rows.sort(key=lambda r: (r[1], r[2]))
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return ["day", "data_type", "edge_id", "record_count", "hours_with_data", "status"], rows
+
+
+def query_ingestion_metrics(records: List[Dict[str, Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Equivalent of athena/queries/ingestion_metrics.sql"""
+    counts: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        hour = _parse_ts(record["timestamp"]).strftime("%Y-%m-%d %H:00")
+        counts[(record["data_type"], record["edge_id"])][hour] += 1
+
+    rows = []
+    for (data_type, edge_id), by_hour in counts.items():
+        ordered = sorted(by_hour.items())
+        for i, (hour, records_count) in enumerate(ordered):
+            window = [c for _, c in ordered[max(0, i - 3):i + 1]]
+            rows.append([hour, data_type, edge_id, records_count, round(sum(window) / len(window), 2)])
+    rows.sort(key=lambda r: (r[1], r[2]))
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return ["hour", "data_type", "edge_id", "records_count", "moving_avg"], rows
+
+
+# Query name -> (implementation, data types it reads)
+QUERIES: Dict[str, Tuple[Callable, Optional[Tuple[str, ...]]]] = {
+    "lap-times": (query_lap_times, ("lap_times",)),
+    "pit-stops": (query_pit_stops, ("pit_stops",)),
+    "data-quality": (query_data_quality, None),
+    "ingestion-metrics": (query_ingestion_metrics, None),
+}
+
+
+def _print_results(columns: List[str], rows: List[List[Any]], fmt: str):
+    if fmt == "json":
+        json.dump([dict(zip(columns, row)) for row in rows], sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif fmt == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    else:
+        widths = [max([len(c)] + [len(str(row[i])) for row in rows]) for i, c in enumerate(columns)]
+        print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+        print("  ".join("-" * w for w in widths))
+        for row in rows:
+            print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def build_source(location: str, endpoint_url: Optional[str], region: str):
+    """s3://bucket selects S3Source, anything else is treated as a local directory"""
+    if location.startswith("s3://"):
+        return S3Source(location[len("s3://"):].strip("/"), endpoint_url=endpoint_url, region=region)
+    return LocalSource(location)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query raw F1 telemetry partitions locally")
+    parser.add_argument("query", choices=sorted(QUERIES))
+    parser.add_argument(
+        "--source",
+        default=os.environ.get("TELEMETRY_SOURCE", "s3://f1-telemetry-raw"),
+        help="s3://bucket or a local directory containing raw-telemetry/"
+    )
+    parser.add_argument("--endpoint-url", default=os.environ.get("S3_ENDPOINT_URL"),
+                        help="S3-compatible endpoint, e.g. http://localhost:9000 for MinIO")
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"))
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--month", type=int)
+    parser.add_argument("--day", type=int)
+    parser.add_argument("--data-type", action="append", dest="data_types",
+                        help="Restrict data_type partitions (repeatable, data-quality/ingestion-metrics only)")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--cache-dir", default=os.path.expanduser("~/.cache/f1-telemetry-query"))
+    parser.add_argument("--cache-mb", type=int, default=256, help="0 disables the object cache")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="List partitions instead of planning from ingestion manifests "
+                             "(also finds objects stored before manifests were enabled)")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    args = parser.parse_args(argv)
+
+    query, query_types = QUERIES[args.query]
+    partitions = PartitionFilter(
+        year=args.year,
+        month=args.month,
+        day=args.day,
+        data_types=query_types or (tuple(args.data_types) if args.data_types else None)
+    )
+
+    source = build_source(args.source, args.endpoint_url, args.region)
+    cache = ObjectCache(args.cache_dir, args.cache_mb * 1024 * 1024) if args.cache_mb else None
+    scanner = TelemetryScanner(source, cache=cache, workers=args.workers, use_manifests=not args.no_manifest)
+
+    started = time.monotonic()
+    records = scanner.scan(partitions)
+    columns, rows = query(records)
+    elapsed = time.monotonic() - started
+
+    _print_results(columns, rows, args.format)
+    stats = scanner.stats
+    logger.info(
+        f"Scanned {stats.partitions} partitions ({stats.manifests} planned from manifests, {stats.listed} "
+        f"listed), {stats.objects} objects, "
+        f"{stats.bytes / 1024:.1f} KiB ({stats.cache_hits} cached, {stats.skipped} skipped) "
+        f"in {elapsed:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
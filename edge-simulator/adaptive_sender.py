@@ -0,0 +1,442 @@
+"""
+F1 Telemetry Edge Simulator - Link-Adaptive Sender
+Measures trackside link health and adapts batching, compression and priority
+"""
+import gzip
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Any, Optional, List, Callable, Deque, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class LinkQuality(str, Enum):
+    """Coarse classification of the edge-to-cloud link"""
+    GOOD = "good"
+    DEGRADED = "degraded"
+    BAD = "bad"
+
+
+# Lower value = more important. Critical data is never deferred.
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+DATA_TYPE_PRIORITY = {
+    "pit_stops": PRIORITY_CRITICAL,
+    "lap_times": PRIORITY_CRITICAL,
+    "car_telemetry": PRIORITY_NORMAL,
+    "race_results": PRIORITY_NORMAL,
+    "fastest_laps": PRIORITY_NORMAL,
+    "qualifying": PRIORITY_NORMAL,
+    "driver_standings": PRIORITY_LOW,
+    "constructor_standings": PRIORITY_LOW,
+}
+
+
+@dataclass(frozen=True)
+class SendPolicy:
+    """How the sender behaves for a given link quality"""
+    batch_size: int
+    compresslevel: int
+    max_priority: int
+
+
+SEND_POLICIES = {
+    # Good link: send every message as soon as it is collected
+    LinkQuality.GOOD: SendPolicy(batch_size=1, compresslevel=0, max_priority=PRIORITY_LOW),
+    # Degraded link: coalesce, compress and hold back standings snapshots
+    LinkQuality.DEGRADED: SendPolicy(batch_size=4, compresslevel=6, max_priority=PRIORITY_NORMAL),
+    # Bad link: only critical data, in large maximally-compressed batches
+    LinkQuality.BAD: SendPolicy(batch_size=16, compresslevel=9, max_priority=PRIORITY_CRITICAL),
+}
+
+# Upper bound on an uncompressed batch body, well under the emulated link's
+# 256KB transmit queue (a batch of 16 car telemetry frames is ~600KB)
+MAX_BATCH_BYTES = 128 * 1024
+
+
+class LinkMonitor:
+    """
+    Tracks RTT, throughput and error rate as exponentially weighted averages.
+    The link is only classified BAD once min_samples exchanges have been
+    measured, so a single early failure cannot condemn it.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        degraded_rtt: float = 0.25,
+        bad_rtt: float = 1.0,
+        degraded_error_rate: float = 0.05,
+        bad_error_rate: float = 0.25,
+        min_throughput_bps: float = 16 * 1024,
+        throughput_sample_bytes: int = 8 * 1024,
+        min_samples: int = 4
+    ):
+        self.alpha = alpha
+        self.degraded_rtt = degraded_rtt
+        self.bad_rtt = bad_rtt
+        self.degraded_error_rate = degraded_error_rate
+        self.bad_error_rate = bad_error_rate
+        self.min_throughput_bps = min_throughput_bps
+        self.throughput_sample_bytes = throughput_sample_bytes
+        self.min_samples = min_samples
+
+        self.rtt: Optional[float] = None
+        self.throughput_bps: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * current
+
+    def record_success(self, rtt: float, nbytes: int):
+        """Record a successful transmission of nbytes that took rtt seconds"""
+        self.samples += 1
+        self.rtt = self._ewma(self.rtt, rtt)
+        # Small messages are latency-bound and say nothing about bandwidth
+        if rtt > 0 and nbytes >= self.throughput_sample_bytes:
+            self.throughput_bps = self._ewma(self.throughput_bps, nbytes / rtt)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+
+    def record_failure(self, rtt: float):
+        """Record a failed transmission attempt"""
+        self.samples += 1
+        self.rtt = self._ewma(self.rtt, rtt)
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+
+    @property
+    def quality(self) -> LinkQuality:
+        """Classify the link from the current estimates (optimistic until measured)"""
+        if self.samples == 0:
+            return LinkQuality.GOOD
+
+        rtt = self.rtt or 0.0
+        if self.samples >= self.min_samples and (rtt >= self.bad_rtt or self.error_rate >= self.bad_error_rate):
+            return LinkQuality.BAD
+
+        slow = self.throughput_bps is not None and self.throughput_bps < self.min_throughput_bps
+        if rtt >= self.degraded_rtt or self.error_rate >= self.degraded_error_rate or slow:
+            return LinkQuality.DEGRADED
+
+        return LinkQuality.GOOD
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current link estimates, for logging"""
+        return {
+            "quality": self.quality.value,
+            "rtt_ms": round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            "throughput_kbps": round(self.throughput_bps / 1024, 1) if self.throughput_bps else None,
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+@dataclass(frozen=True)
+class EncodedFrame:
+    """A pre-encoded binary frame; frames are coalesced by concatenation"""
+    data_type: str
+    body: bytes
+    content_type: str
+    trace_id: Optional[str] = None
+
+
+# A queued message: a JSON telemetry envelope or an encoded binary frame
+Message = Union[Dict[str, Any], EncodedFrame]
+
+# Transport routes
+ROUTE_SINGLE = "telemetry"
+ROUTE_BATCH = "batch"
+ROUTE_FRAMES = "frames"
+
+# Transport signature: (route, body, headers) -> success, or a Future resolving
+# to success for asynchronous transports (e.g. the network emulator)
+Transport = Callable[[str, bytes, Dict[str, str]], Union[bool, "Future[bool]"]]
+
+
+class AdaptiveSender:
+    """
+    Queues telemetry and transmits it according to the measured link quality.
+
+    Every submit or flush that finds the link untried for probe_interval
+    seconds sends what the policy allows, even a partial batch; if the policy
+    holds everything back, the oldest deferred message is sent as a probe so
+    the monitor keeps measuring and notices when the link recovers.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        monitor: Optional[LinkMonitor] = None,
+        adaptive: bool = True,
+        max_deferral: float = 300.0,
+        max_pending: int = 256,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        probe_interval: float = 5.0
+    ):
+        self.transport = transport
+        self.monitor = monitor or LinkMonitor()
+        self.adaptive = adaptive
+        self.max_deferral = max_deferral
+        self.max_pending = max_pending
+        self.max_batch_bytes = max_batch_bytes
+        self.probe_interval = probe_interval
+        self.in_flight = 0
+        self._last_attempt = time.monotonic()
+        # One FIFO per priority level of (enqueue_time, message)
+        self._queues: Dict[int, Deque[Tuple[float, Message]]] = {
+            PRIORITY_CRITICAL: deque(),
+            PRIORITY_NORMAL: deque(),
+            PRIORITY_LOW: deque(),
+        }
+        # Asynchronous transports complete (and requeue failures) on other threads
+        self._lock = threading.RLock()
+
+    @property
+    def policy(self) -> SendPolicy:
+        """Send policy for the current link quality"""
+        if not self.adaptive:
+            return SEND_POLICIES[LinkQuality.GOOD]
+        return SEND_POLICIES[self.monitor.quality]
+
+    @property
+    def pending(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def submit(self, telemetry: Message) -> bool:
+        """
+        Send telemetry now if the link allows it, otherwise queue it.
+        Returns False only if an immediate synchronous send failed.
+        """
+        priority = _priority(telemetry)
+        with self._lock:
+            policy = self.policy
+
+            if policy.batch_size == 1 and self.pending == 0 and priority <= policy.max_priority:
+                if self._transmit([telemetry], policy.compresslevel):
+                    return True
+                # Keep it for the next flush rather than losing it
+                self._enqueue(priority, telemetry)
+                return False
+
+            self._enqueue(priority, telemetry)
+            if self._eligible_count(policy) >= policy.batch_size or self._probe_due():
+                self.flush()
+            return True
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Transmit queued telemetry allowed by the current policy, critical first.
+        Low-priority items older than max_deferral (or all, with force) are sent
+        regardless of link quality, and the oldest deferred message is sent as a
+        probe when nothing else is and the link has been idle for probe_interval.
+        Returns the number of messages handed to the transport.
+        """
+        with self._lock:
+            policy = self.policy
+            now = time.monotonic()
+            ready: List[Tuple[int, float, Message]] = []
+
+            for priority in sorted(self._queues):
+                queue = self._queues[priority]
+                deferred: Deque[Tuple[float, Message]] = deque()
+                while queue:
+                    enqueued_at, telemetry = queue.popleft()
+                    overdue = now - enqueued_at >= self.max_deferral
+                    if priority <= policy.max_priority or overdue or force:
+                        ready.append((priority, enqueued_at, telemetry))
+                    else:
+                        deferred.append((enqueued_at, telemetry))
+                queue.extend(deferred)
+
+            if not ready and self._probe_due():
+                for priority in sorted(self._queues):
+                    if self._queues[priority]:
+                        enqueued_at, telemetry = self._queues[priority].popleft()
+                        ready.append((priority, enqueued_at, telemetry))
+                        break
+
+            # JSON envelopes and binary frames travel on different routes; a
+            # chunk closes at batch_size messages or max_batch_bytes
+            chunks = []
+            for frames in (False, True):
+                chunk, chunk_bytes = [], 0
+                for entry in ready:
+                    if isinstance(entry[2], EncodedFrame) != frames:
+                        continue
+                    nbytes = _size(entry[2])
+                    if chunk and (len(chunk) == policy.batch_size or chunk_bytes + nbytes > self.max_batch_bytes):
+                        chunks.append(chunk)
+                        chunk, chunk_bytes = [], 0
+                    chunk.append(entry)
+                    chunk_bytes += nbytes
+                if chunk:
+                    chunks.append(chunk)
+
+            sent = 0
+            for i, chunk in enumerate(chunks):
+                if not self._transmit([t for _, _, t in chunk], policy.compresslevel, [e for _, e, _ in chunk]):
+                    # Link failed mid-flush: put everything unsent back at the head
+                    # of its queue, preserving order, and retry on the next flush
+                    unsent = [entry for rest in chunks[i:] for entry in rest]
+                    for priority, enqueued_at, telemetry in reversed(unsent):
+                        self._queues[priority].appendleft((enqueued_at, telemetry))
+                    break
+                sent += len(chunk)
+
+            if self.pending:
+                logger.info(f"📦 {self.pending} message(s) deferred - link {self.monitor.snapshot()}")
+            return sent
+
+    def _enqueue(self, priority: int, telemetry: Message, enqueued_at: Optional[float] = None):
+        """
+        Queue a new message, or with enqueued_at requeue a failed one at the head
+        of its queue, keeping its original enqueue time so deferral still expires
+        """
+        queue = self._queues[priority]
+        requeue = enqueued_at is not None
+        if priority == PRIORITY_LOW:
+            # Standings are full snapshots: a newer one supersedes a queued one
+            for i, (queued_at, queued) in enumerate(queue):
+                if _data_type(queued) == _data_type(telemetry):
+                    if not requeue:
+                        queue[i] = (queued_at, telemetry)
+                    return
+        if requeue:
+            queue.appendleft((enqueued_at, telemetry))
+        else:
+            queue.append((time.monotonic(), telemetry))
+
+        while self.pending > self.max_pending:
+            # Shed the oldest message of the least important non-empty level
+            for level in sorted(self._queues, reverse=True):
+                if self._queues[level]:
+                    dropped = self._queues[level].popleft()[1]
+                    logger.warning(f"🗑️  Send queue full, dropping {_data_type(dropped)}")
+                    break
+
+    def _probe_due(self) -> bool:
+        return self.pending > 0 and time.monotonic() - self._last_attempt >= self.probe_interval
+
+    def _eligible_count(self, policy: SendPolicy) -> int:
+        return sum(len(q) for p, q in self._queues.items() if p <= policy.max_priority)
+
+    def _transmit(self, items: List[Message], compresslevel: int, enqueued: Optional[List[float]] = None) -> bool:
+        """
+        Serialize, optionally compress and send; measurements are recorded on
+        completion. enqueued holds the items' enqueue times (now if not queued).
+        """
+        if enqueued is None:
+            enqueued = [time.monotonic()] * len(items)
+        if isinstance(items[0], EncodedFrame):
+            route = ROUTE_FRAMES
+            headers = {"Content-Type": items[0].content_type}
+            body = b"".join(frame.body for frame in items)
+        elif len(items) == 1 and compresslevel == 0:
+            route = ROUTE_SINGLE
+            headers = {"Content-Type": "application/json"}
+            body = json.dumps(items[0]).encode("utf-8")
+        else:
+            route = ROUTE_BATCH
+            headers = {"Content-Type": "application/json"}
+            body = json.dumps(items).encode("utf-8")
+
+        # One trace ID per message or frame, in body order
+        traces = [_trace_id(item) or "" for item in items]
+        if any(traces):
+            headers["X-Trace-ID"] = ",".join(traces)
+
+        if compresslevel:
+            body = gzip.compress(body, compresslevel=compresslevel)
+            headers["Content-Encoding"] = "gzip"
+
+        started = self._last_attempt = time.monotonic()
+        result = self.transport(route, body, headers)
+        if isinstance(result, Future) and result.done():
+            # Refused without being sent (e.g. the emulated send buffer is full):
+            # fail synchronously so the flush stops and keeps the rest queued
+            result = _future_ok(result)
+
+        if isinstance(result, Future):
+            self.in_flight += len(items)
+            result.add_done_callback(
+                lambda f: self._complete(_future_ok(f), items, enqueued, started, len(body), compresslevel, True)
+            )
+            return True
+
+        self._complete(result, items, enqueued, started, len(body), compresslevel, False)
+        return result
+
+    def _complete(
+        self,
+        ok: bool,
+        items: List[Message],
+        enqueued: List[float],
+        started: float,
+        nbytes: int,
+        compresslevel: int,
+        asynchronous: bool
+    ):
+        rtt = time.monotonic() - started
+        with self._lock:
+            if asynchronous:
+                self.in_flight -= len(items)
+
+            if ok:
+                self.monitor.record_success(rtt, nbytes)
+                if len(items) > 1 or compresslevel:
+                    logger.info(
+                        f"📦 Sent batch of {len(items)} ({nbytes} bytes, "
+                        f"gzip={compresslevel}) - link {self.monitor.snapshot()}"
+                    )
+                else:
+                    logger.info(
+                        f"✅ Successfully sent {_data_type(items[0])} telemetry to cloud "
+                        f"(trace {_trace_id(items[0]) or '-'})"
+                    )
+                return
+
+            self.monitor.record_failure(rtt)
+            if asynchronous:
+                # Nobody is waiting on an async send: requeue for the next flush
+                for telemetry, enqueued_at in reversed(list(zip(items, enqueued))):
+                    self._enqueue(_priority(telemetry), telemetry, enqueued_at=enqueued_at)
+
+
+def _data_type(message: Message) -> Optional[str]:
+    if isinstance(message, EncodedFrame):
+        return message.data_type
+    return message.get("data_type")
+
+
+def _trace_id(message: Message) -> Optional[str]:
+    if isinstance(message, EncodedFrame):
+        return message.trace_id
+    return message.get("metadata", {}).get("trace_id")
+
+
+def _size(message: Message) -> int:
+    """Uncompressed body bytes the message adds to a batch"""
+    if isinstance(message, EncodedFrame):
+        return len(message.body)
+    return len(json.dumps(message))
+
+
+def _priority(message: Message) -> int:
+    return DATA_TYPE_PRIORITY.get(_data_type(message), PRIORITY_NORMAL)
+
+
+def _future_ok(future: "Future[bool]") -> bool:
+    try:
+        return bool(future.result())
+    except Exception as e:
+        logger.error(f"❌ Failed to send telemetry: {e}")
+        return False
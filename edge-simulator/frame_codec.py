@@ -0,0 +1,62 @@
+"""
+F1 Telemetry Edge Simulator - Binary Frame Encoding
+Packs synthetic telemetry frames into the versioned binary content type
+accepted by the ingestion service at /api/v1/telemetry/frames
+"""
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from telemetry_generator import TelemetryFrame
+
+FRAME_CONTENT_TYPE = "application/vnd.f1-telemetry.frame.v1"
+FRAME_MAGIC = b"F1TF"
+FRAME_VERSION = 1
+
+# magic, version, flags, schema_id, sample_count, base_time_us, edge_id length
+FRAME_HEADER = struct.Struct("<4sBBHIqB")
+
+# Channel schemas: (name, little-endian dtype) in wire order. Columns are sorted
+# by descending width so that, with the 8-byte aligned header, every column
+# starts aligned for zero-copy decoding. Must match ingestion-service/frames.py.
+SCHEMA_CAR_TELEMETRY = 1
+FRAME_SCHEMAS: Dict[int, List[Tuple[str, str]]] = {
+    SCHEMA_CAR_TELEMETRY: [
+        ("lat", "<f8"), ("lon", "<f8"),
+        ("t_us", "<u4"), ("distance", "<f4"), ("speed", "<f4"),
+        ("lap", "<u2"), ("rpm", "<u2"),
+        ("car", "u1"), ("throttle", "u1"), ("brake", "u1"), ("gear", "i1"), ("drs", "u1"),
+    ],
+}
+
+
+def header_size(edge_id_len: int) -> int:
+    """Header length including edge_id, padded to a multiple of 8 bytes"""
+    return (FRAME_HEADER.size + edge_id_len + 7) // 8 * 8
+
+
+def encode_frame(frame: TelemetryFrame, edge_id: str, schema_id: int = SCHEMA_CAR_TELEMETRY) -> bytes:
+    """
+    Encode a frame as: fixed header + edge_id + padding, then one fixed-width
+    column per schema channel (sample_count values each). Frames can be
+    concatenated into a single request body.
+    """
+    schema: List[Tuple[str, str]] = FRAME_SCHEMAS[schema_id]
+    edge = edge_id.encode("utf-8")
+    if len(edge) > 255:
+        raise ValueError("edge_id longer than 255 bytes")
+
+    count = frame.sample_count
+    header = FRAME_HEADER.pack(
+        FRAME_MAGIC, FRAME_VERSION, 0, schema_id, count, int(round(frame.base_time * 1_000_000)), len(edge)
+    )
+    padding = b"\0" * (header_size(len(edge)) - len(header) - len(edge))
+
+    parts = [header, edge, padding]
+    for name, dtype in schema:
+        column = np.asarray(frame.channels[name], dtype=dtype)
+        if len(column) != count:
+            raise ValueError(f"Channel {name} has {len(column)} samples, expected {count}")
+        parts.append(column.tobytes())
+    return b"".join(parts)
@@ -0,0 +1,82 @@
+"""
+F1 Telemetry Edge Simulator - Heartbeats
+Periodic NTP-style exchanges with the ingestion service so it can estimate this
+device's clock offset and correct collection-to-cloud latency measurements
+"""
+import time
+import logging
+import threading
+from typing import Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def clock_offset(t0: float, t1: float, t2: float, t3: float) -> Tuple[float, float]:
+    """
+    (offset, rtt) of one exchange: t0/t3 are request sent / response received
+    on the edge clock, t1/t2 request received / response sent on the service
+    clock. offset is service clock minus edge clock.
+    """
+    return ((t1 - t0) + (t2 - t3)) / 2, (t3 - t0) - (t2 - t1)
+
+
+class HeartbeatSender:
+    """
+    Sends a heartbeat every interval on a daemon thread. Each heartbeat carries
+    the offset and round-trip time measured on the previous exchange, since an
+    exchange's own sample is only known once its response is back. The
+    service therefore sees each sample one interval late; it keeps the
+    lowest-RTT estimate per edge, and clock drift over one interval is far
+    below the RTT noise. The first sample is reported straight away rather
+    than an interval later, so latency is corrected from startup.
+
+    Heartbeats go straight over the session, not through the adaptive sender
+    or network emulator: they measure the real clocks, and must not be queued.
+    """
+
+    def __init__(self, session: requests.Session, endpoint: str, edge_id: str, interval: float = 15.0):
+        self.session = session
+        self.endpoint = endpoint
+        self.edge_id = edge_id
+        self.interval = interval
+        self.offset: Optional[float] = None
+        self.rtt: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="heartbeat", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def beat(self) -> bool:
+        """One heartbeat exchange; returns True when a new measurement was taken"""
+        t0 = time.time()
+        try:
+            response = self.session.post(
+                self.endpoint,
+                json={"edge_id": self.edge_id, "sent_at": t0, "offset": self.offset, "rtt": self.rtt},
+                timeout=5,
+                headers={"X-Edge-ID": self.edge_id}
+            )
+            response.raise_for_status()
+            reply = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"💓 Heartbeat failed: {e}")
+            return False
+        t3 = time.time()
+
+        self.offset, self.rtt = clock_offset(t0, reply["received_at"], reply["responded_at"], t3)
+        logger.debug(f"💓 Clock offset {self.offset * 1000:+.1f} ms (rtt {self.rtt * 1000:.1f} ms)")
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            first = self.offset is None
+            if self.beat() and first:
+                # Report the first measurement now
+                continue
+            self._stop.wait(self.interval)
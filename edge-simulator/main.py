@@ -5,14 +5,23 @@ Replays cached 2024 race data as live telemetry
 import os
 import time
 import json
-import random
+import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List, Union
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from adaptive_sender import (
+    AdaptiveSender, EncodedFrame, LinkMonitor, ROUTE_BATCH, ROUTE_FRAMES, ROUTE_SINGLE
+)
+from frame_codec import FRAME_CONTENT_TYPE, encode_frame
+from heartbeat import HeartbeatSender
+from network_emulator import NetworkEmulator, build_link_model
+from telemetry_generator import CarTelemetryGenerator, TelemetryFrame
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -137,19 +146,46 @@ class EdgeSimulator:
         cloud_endpoint: str,
         simulate_latency: bool = True,
         simulate_packet_loss: bool = False,
-        packet_loss_rate: float = 0.02
+        packet_loss_rate: float = 0.02,
+        adaptive_sending: bool = True,
+        network_profile: Optional[str] = None,
+        link_bandwidth_kbps: Optional[float] = None,
+        heartbeat_interval: float = 15.0
     ):
         self.cloud_endpoint = cloud_endpoint
+        self.endpoints = {
+            ROUTE_SINGLE: cloud_endpoint,
+            ROUTE_BATCH: f"{cloud_endpoint.rstrip('/')}/batch",
+            ROUTE_FRAMES: f"{cloud_endpoint.rstrip('/')}/frames",
+        }
         self.simulate_latency = simulate_latency
         self.simulate_packet_loss = simulate_packet_loss
         self.packet_loss_rate = packet_loss_rate
         self.replayer = CachedDataReplayer()
         self.session = self._create_session()
+        self.network = self._create_network_emulator(network_profile, link_bandwidth_kbps)
+        self.sender = AdaptiveSender(
+            transport=self._post,
+            monitor=LinkMonitor(),
+            adaptive=adaptive_sending
+        )
+        self.heartbeat = None
+        if heartbeat_interval > 0:
+            self.heartbeat = HeartbeatSender(
+                self.session,
+                f"{cloud_endpoint.rstrip('/')}/heartbeat",
+                os.environ.get("EDGE_ID", "trackside-edge-001"),
+                interval=heartbeat_interval
+            )
+            self.heartbeat.start()
 
         logger.info(f"🏎️  Edge Simulator initialized - REPLAY MODE")
         logger.info(f"Cloud endpoint: {cloud_endpoint}")
         logger.info(f"Latency simulation: {simulate_latency}")
         logger.info(f"Packet loss simulation: {simulate_packet_loss} (rate: {packet_loss_rate})")
+        logger.info(f"Network emulation: {self.network.model.__class__.__name__ if self.network else 'off'}")
+        logger.info(f"Adaptive sending: {adaptive_sending}")
+        logger.info(f"Heartbeat interval: {f'{heartbeat_interval:g}s' if self.heartbeat else 'off'}")
 
     def _create_session(self) -> requests.Session:
         """Create requests session with retry logic"""
@@ -159,22 +195,34 @@ class EdgeSimulator:
             backoff_factor=2,
             status_forcelist=[429, 500, 502, 503, 504]
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        # Pool sized for the network emulator's concurrent deliveries
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=8)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
 
-    def _simulate_network_conditions(self):
-        """Simulate network latency and packet loss"""
-        if self.simulate_latency:
-            # Simulate variable network latency (20-200ms for trackside)
-            latency = random.uniform(0.02, 0.2)
-            time.sleep(latency)
+    def _create_network_emulator(
+        self,
+        network_profile: Optional[str],
+        link_bandwidth_kbps: Optional[float]
+    ) -> Optional[NetworkEmulator]:
+        """Build the link emulator from an explicit profile or the legacy latency/loss flags"""
+        if network_profile is None:
+            if self.simulate_latency:
+                network_profile = "trackside"
+            elif self.simulate_packet_loss:
+                network_profile = "perfect"
+            else:
+                network_profile = "none"
+            loss_rate = self.packet_loss_rate if self.simulate_packet_loss else 0.0
+        else:
+            loss_rate = self.packet_loss_rate if self.simulate_packet_loss else None
 
-        if self.simulate_packet_loss:
-            # Randomly drop packets
-            if random.random() < self.packet_loss_rate:
-                raise Exception("Simulated packet loss")
+        model = build_link_model(network_profile, packet_loss_rate=loss_rate, bandwidth_kbps=link_bandwidth_kbps)
+        if model is None:
+            return None
+        logger.info(f"📶 Emulating '{network_profile}' link")
+        return NetworkEmulator(model)
 
     def _enrich_telemetry(self, data: Dict[str, Any], data_type: str) -> Dict[str, Any]:
         """Add edge metadata to telemetry"""
@@ -188,34 +236,62 @@ class EdgeSimulator:
                 "source": "cached-replay-2024-bahrain",
                 "version": "1.0.0",
                 "race": "2024 Bahrain Grand Prix",
-                "replay_mode": True
+                "replay_mode": True,
+                "trace_id": uuid.uuid4().hex
             }
         }
 
-    def send_to_cloud(self, telemetry: Dict[str, Any]) -> bool:
-        """Send telemetry to cloud endpoint"""
+    def _enrich_frame(self, frame: TelemetryFrame) -> Dict[str, Any]:
+        """Wrap a synthetic car telemetry frame in the standard envelope"""
+        telemetry = self._enrich_telemetry(frame.to_payload(), "car_telemetry")
+        telemetry["timestamp"] = datetime.utcfromtimestamp(frame.base_time).isoformat() + "Z"
+        telemetry["metadata"].update(
+            source="synthetic-car-telemetry",
+            replay_mode=False,
+            rate_hz=frame.rate_hz,
+            sample_count=frame.sample_count
+        )
+        return telemetry
+
+    def _post(self, route: str, body: bytes, headers: Dict[str, str]) -> Union[bool, "Future[bool]"]:
+        """
+        Transport used by the adaptive sender: POST a single message, a batch or binary frames.
+        With network emulation the request is scheduled on the emulated link and
+        a Future is returned, so emulated delay never blocks the sender.
+        """
+        if self.network:
+            return self.network.submit(lambda: self._http_post(route, body, headers), len(body))
+        return self._http_post(route, body, headers)
+
+    def _http_post(self, route: str, body: bytes, headers: Dict[str, str]) -> bool:
+        """POST to the ingestion service"""
+        endpoint = self.endpoints[route]
         try:
-            self._simulate_network_conditions()
-
             response = self.session.post(
-                self.cloud_endpoint,
-                json=telemetry,
+                endpoint,
+                data=body,
                 timeout=30,
                 headers={
-                    "Content-Type": "application/json",
+                    **headers,
                     "X-Edge-ID": os.environ.get("EDGE_ID", "trackside-edge-001"),
                     "X-Race-Mode": "replay"
                 }
             )
             response.raise_for_status()
-
-            logger.info(f"✅ Successfully sent {telemetry['data_type']} telemetry to cloud")
             return True
 
         except Exception as e:
             logger.error(f"❌ Failed to send telemetry: {e}")
             return False
 
+    def send_to_cloud(self, telemetry: Dict[str, Any]) -> bool:
+        """Send telemetry to cloud, immediately or batched depending on link quality"""
+        pending = self.sender.pending
+        ok = self.sender.submit(telemetry)
+        if ok and self.sender.pending > pending:
+            logger.info(f"📥 Queued {telemetry['data_type']} telemetry (link {self.sender.monitor.quality.value})")
+        return ok
+
     def collect_and_send_race_results(self):
         """Collect and send race results"""
         data = self.replayer.get_race_results()
@@ -303,42 +379,85 @@ class EdgeSimulator:
                 # Simulate race weekend data flow
                 logger.info("📊 Transmitting race results...")
                 self.collect_and_send_race_results()
-                time.sleep(2)
 
                 logger.info("⛽ Transmitting pit stop telemetry...")
                 self.collect_and_send_pit_stops()
-                time.sleep(2)
 
                 logger.info("🏁 Transmitting qualifying data...")
                 self.collect_and_send_qualifying()
-                time.sleep(2)
 
                 logger.info("⏱️  Transmitting lap times...")
                 self.collect_and_send_lap_times()
-                time.sleep(2)
 
                 logger.info("🏎️  Transmitting fastest laps...")
                 self.collect_and_send_fastest_laps()
-                time.sleep(2)
 
                 logger.info("👤 Transmitting driver standings...")
                 self.collect_and_send_driver_standings()
-                time.sleep(2)
 
                 logger.info("🏁 Transmitting constructor standings...")
                 self.collect_and_send_constructor_standings()
 
+                # Push out anything the link policy coalesced or deferred
+                self.sender.flush()
+
                 logger.info(f"")
                 logger.info(f"⏸️  Waiting {interval}s before next transmission...")
                 time.sleep(interval)
 
             except KeyboardInterrupt:
                 logger.info("🛑 Shutting down edge simulator...")
+                if self.heartbeat:
+                    self.heartbeat.stop()
+                self.sender.flush(force=True)
+                if self.network:
+                    self.network.close(wait=True)
                 break
             except Exception as e:
                 logger.error(f"❌ Error in main loop: {e}")
                 time.sleep(10)
 
+    def run_car_telemetry(
+        self,
+        rate_hz: float = 50.0,
+        frame_seconds: float = 1.0,
+        binary: bool = True,
+        loop: bool = False
+    ):
+        """
+        Stream synthetic high-frequency car telemetry for all cars, one frame at a
+        time, as binary column-packed frames or JSON envelopes, until race
+        distance (or indefinitely, restarting the race, with loop)
+        """
+        generator = CarTelemetryGenerator(self.replayer.race_data, rate_hz=rate_hz)
+        edge_id = os.environ.get("EDGE_ID", "trackside-edge-001")
+        logger.info(
+            f"🚀 Streaming car telemetry: {generator.n_cars} cars at {rate_hz:g} Hz, "
+            f"{frame_seconds:g}s {'binary' if binary else 'JSON'} frames ({generator.total_laps} laps)"
+        )
+
+        try:
+            for frame in generator.frames(frame_seconds=frame_seconds, loop=loop):
+                if binary:
+                    self.sender.submit(EncodedFrame(
+                        data_type="car_telemetry",
+                        body=encode_frame(frame, edge_id),
+                        content_type=FRAME_CONTENT_TYPE,
+                        trace_id=uuid.uuid4().hex
+                    ))
+                else:
+                    self.send_to_cloud(self._enrich_frame(frame))
+            logger.info("🏁 Race distance complete")
+        except KeyboardInterrupt:
+            logger.info("🛑 Shutting down edge simulator...")
+        finally:
+            # Also at the end of the race: the last frames are still queued
+            if self.heartbeat:
+                self.heartbeat.stop()
+            self.sender.flush(force=True)
+            if self.network:
+                self.network.close(wait=True)
+
 
 if __name__ == "__main__":
     # Configuration from environment variables
@@ -351,13 +470,30 @@ if __name__ == "__main__":
     simulate_latency = os.environ.get("SIMULATE_LATENCY", "true").lower() == "true"
     simulate_packet_loss = os.environ.get("SIMULATE_PACKET_LOSS", "false").lower() == "true"
     packet_loss_rate = float(os.environ.get("PACKET_LOSS_RATE", "0.02"))
+    adaptive_sending = os.environ.get("ADAPTIVE_SENDING", "true").lower() == "true"
+    network_profile = os.environ.get("NETWORK_PROFILE") or None
+    link_bandwidth_kbps = os.environ.get("LINK_BANDWIDTH_KBPS")
+    simulation_mode = os.environ.get("SIMULATION_MODE", "replay").lower()
+    heartbeat_interval = float(os.environ.get("HEARTBEAT_INTERVAL", "15"))
 
     # Initialize and run simulator
     simulator = EdgeSimulator(
         cloud_endpoint=cloud_endpoint,
         simulate_latency=simulate_latency,
         simulate_packet_loss=simulate_packet_loss,
-        packet_loss_rate=packet_loss_rate
+        packet_loss_rate=packet_loss_rate,
+        adaptive_sending=adaptive_sending,
+        network_profile=network_profile,
+        link_bandwidth_kbps=float(link_bandwidth_kbps) if link_bandwidth_kbps else None,
+        heartbeat_interval=heartbeat_interval
     )
 
-    simulator.run(interval=interval)
+    if simulation_mode == "car-telemetry":
+        simulator.run_car_telemetry(
+            rate_hz=float(os.environ.get("CAR_TELEMETRY_HZ", "50")),
+            frame_seconds=float(os.environ.get("CAR_TELEMETRY_FRAME_SECONDS", "1")),
+            binary=os.environ.get("FRAME_FORMAT", "binary").lower() == "binary",
+            loop=os.environ.get("CAR_TELEMETRY_LOOP", "false").lower() == "true"
+        )
+    else:
+        simulator.run(interval=interval)
@@ -0,0 +1,306 @@
+"""
+F1 Telemetry Edge Simulator - Network Emulator
+Pluggable trackside link models applied asynchronously to outgoing requests
+"""
+import heapq
+import random
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PacketLost(Exception):
+    """Raised (via the request future) when the emulated link drops a request"""
+
+
+class LinkBusy(PacketLost):
+    """Raised (via an already-failed future) when max_outstanding requests are in flight"""
+
+
+@dataclass
+class LatencyModel:
+    """One-way delay: base + |N(0, jitter)| + optional exponential tail (seconds)"""
+    base: float = 0.02
+    jitter: float = 0.0
+    tail: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        delay = self.base
+        if self.jitter:
+            delay += abs(rng.gauss(0.0, self.jitter))
+        if self.tail:
+            delay += rng.expovariate(1.0 / self.tail)
+        return delay
+
+
+@dataclass
+class GilbertElliottLoss:
+    """
+    Two-state burst loss model. Per packet the channel moves good->bad with
+    probability p and bad->good with probability r, then drops the packet with
+    the loss probability of the state it is in.
+    """
+    p: float = 0.0
+    r: float = 1.0
+    loss_good: float = 0.0
+    loss_bad: float = 1.0
+    bad: bool = field(default=False, init=False)
+
+    @classmethod
+    def from_mean_rate(cls, rate: float, mean_burst: float = 3.0) -> "GilbertElliottLoss":
+        """Bursty model with the given long-run loss rate and mean burst length"""
+        if rate <= 0:
+            return cls()
+        rate = min(rate, 0.99)
+        r = 1.0 / mean_burst
+        return cls(p=rate * r / (1.0 - rate), r=r)
+
+    @property
+    def mean_rate(self) -> float:
+        if self.p + self.r == 0:
+            return self.loss_bad if self.bad else self.loss_good
+        return (self.r * self.loss_good + self.p * self.loss_bad) / (self.p + self.r)
+
+    def drop(self, rng: random.Random) -> bool:
+        if self.bad:
+            if rng.random() < self.r:
+                self.bad = False
+        elif rng.random() < self.p:
+            self.bad = True
+        return rng.random() < (self.loss_bad if self.bad else self.loss_good)
+
+
+@dataclass
+class Outage:
+    """
+    Scheduled total link loss, in seconds since the emulator started. With a
+    period the outage repeats (e.g. the tunnel section on every lap).
+    """
+    start: float
+    duration: float
+    period: Optional[float] = None
+
+    def active(self, elapsed: float) -> bool:
+        if elapsed < self.start:
+            return False
+        offset = elapsed - self.start
+        if self.period:
+            offset %= self.period
+        return offset < self.duration
+
+
+class LinkModel:
+    """Base link model: a perfect link with no delay or loss"""
+
+    def transmit(self, nbytes: int, now: float, elapsed: float, rng: random.Random) -> Optional[float]:
+        """
+        Return the delay until a request of nbytes sent at monotonic time `now`
+        reaches the far end, or None if it is lost.
+        """
+        return 0.0
+
+    def response_delay(self, rng: random.Random) -> float:
+        """Delay for the (small) response on the return path"""
+        return 0.0
+
+
+class ImpairedLink(LinkModel):
+    """
+    Link with a bandwidth cap and bounded transmit queue, a latency
+    distribution with jitter, Gilbert-Elliott burst loss and scheduled outages.
+    """
+
+    def __init__(
+        self,
+        bandwidth_bps: Optional[float] = None,
+        latency: Optional[LatencyModel] = None,
+        loss: Optional[GilbertElliottLoss] = None,
+        outages: Optional[List[Outage]] = None,
+        queue_limit_bytes: int = 256 * 1024
+    ):
+        self.bandwidth_bps = bandwidth_bps
+        self.latency = latency or LatencyModel(base=0.0)
+        self.loss = loss or GilbertElliottLoss()
+        self.outages = outages or []
+        self.queue_limit_bytes = queue_limit_bytes
+        self._busy_until = 0.0
+
+    def transmit(self, nbytes: int, now: float, elapsed: float, rng: random.Random) -> Optional[float]:
+        if any(outage.active(elapsed) for outage in self.outages):
+            return None
+
+        serialization = 0.0
+        if self.bandwidth_bps:
+            backlog_bytes = max(0.0, self._busy_until - now) * self.bandwidth_bps / 8
+            if backlog_bytes and backlog_bytes + nbytes > self.queue_limit_bytes:
+                # Tail drop: the edge router's buffer is full. An idle link always
+                # accepts a request, however large, or it could never be delivered
+                return None
+            start = max(now, self._busy_until)
+            self._busy_until = start + nbytes * 8 / self.bandwidth_bps
+            serialization = self._busy_until - now
+
+        if self.loss.drop(rng):
+            return None
+
+        return serialization + self.latency.sample(rng)
+
+    def response_delay(self, rng: random.Random) -> float:
+        return self.latency.sample(rng)
+
+
+def build_link_model(
+    profile: str,
+    packet_loss_rate: Optional[float] = None,
+    bandwidth_kbps: Optional[float] = None
+) -> Optional[LinkModel]:
+    """
+    Build a named link profile. Returns None for "none" (no emulation).
+    packet_loss_rate and bandwidth_kbps override the profile defaults.
+    """
+    profile = profile.lower()
+    if profile == "none":
+        return None
+
+    if profile == "perfect":
+        model = ImpairedLink()
+    elif profile == "trackside":
+        # Typical paddock uplink: 20-200ms with jitter, occasional short bursts of loss
+        model = ImpairedLink(
+            bandwidth_bps=10_000_000,
+            latency=LatencyModel(base=0.02, jitter=0.06, tail=0.02),
+            loss=GilbertElliottLoss.from_mean_rate(0.005)
+        )
+    elif profile == "degraded":
+        model = ImpairedLink(
+            bandwidth_bps=1_000_000,
+            latency=LatencyModel(base=0.15, jitter=0.1, tail=0.1),
+            loss=GilbertElliottLoss.from_mean_rate(0.03, mean_burst=5.0)
+        )
+    elif profile == "tunnel":
+        # Moderate link plus a 4s blackout every 90s lap (tunnel section of the circuit)
+        model = ImpairedLink(
+            bandwidth_bps=2_000_000,
+            latency=LatencyModel(base=0.08, jitter=0.05, tail=0.05),
+            loss=GilbertElliottLoss.from_mean_rate(0.01),
+            outages=[Outage(start=40.0, duration=4.0, period=90.0)]
+        )
+    else:
+        raise ValueError(f"Unknown network profile: {profile}")
+
+    if packet_loss_rate is not None:
+        model.loss = GilbertElliottLoss.from_mean_rate(packet_loss_rate)
+    if bandwidth_kbps is not None:
+        model.bandwidth_bps = bandwidth_kbps * 1000
+    return model
+
+
+class NetworkEmulator:
+    """
+    Applies a link model to requests without blocking the caller.
+
+    submit() returns immediately with a Future. A scheduler thread releases each
+    request to a worker pool once its emulated forward delay has elapsed; the
+    worker performs the real request, and the result is published after the
+    emulated response delay. Lost requests fail with PacketLost after
+    loss_timeout, as a client-side timeout would. At most max_outstanding
+    requests are in flight; like a full socket send buffer, further requests
+    fail at once with LinkBusy instead of piling up during an outage.
+    """
+
+    def __init__(
+        self,
+        model: LinkModel,
+        max_workers: int = 8,
+        loss_timeout: float = 2.0,
+        max_outstanding: int = 64,
+        seed: Optional[int] = None
+    ):
+        self.model = model
+        self.loss_timeout = loss_timeout
+        self.max_outstanding = max_outstanding
+        self._rng = random.Random(seed)
+        self._started = time.monotonic()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="netem")
+        # Heap of (due_time, seq, action)
+        self._events: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = 0
+        self._outstanding = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._scheduler = threading.Thread(target=self._run, name="netem-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def submit(self, request: Callable[[], Any], nbytes: int) -> "Future[Any]":
+        """Schedule request() to run after the emulated forward delay"""
+        future: Future = Future()
+        now = time.monotonic()
+
+        with self._cond:
+            if self._outstanding >= self.max_outstanding:
+                future.set_exception(LinkBusy(f"{self._outstanding} requests already in flight"))
+                return future
+            future.add_done_callback(self._on_done)
+            self._outstanding += 1
+            delay = self.model.transmit(nbytes, now, now - self._started, self._rng)
+            if delay is None:
+                self._schedule(now + self.loss_timeout, lambda: future.set_exception(
+                    PacketLost(f"Simulated packet loss ({nbytes} bytes)")
+                ))
+            else:
+                self._schedule(now + delay, lambda: self._pool.submit(self._deliver, request, future))
+        return future
+
+    def close(self, wait: bool = True):
+        """Stop the scheduler once idle; with wait, block until in-flight requests complete"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if wait:
+            self._scheduler.join()
+        self._pool.shutdown(wait=wait)
+
+    def _on_done(self, _future: Future):
+        with self._cond:
+            self._outstanding -= 1
+            self._cond.notify()
+
+    def _schedule(self, due: float, action: Callable[[], None]):
+        self._seq += 1
+        heapq.heappush(self._events, (due, self._seq, action))
+        self._cond.notify()
+
+    def _deliver(self, request: Callable[[], Any], future: Future):
+        try:
+            outcome = partial(future.set_result, request())
+        except Exception as e:
+            outcome = partial(future.set_exception, e)
+
+        with self._cond:
+            delay = self.model.response_delay(self._rng)
+            self._schedule(time.monotonic() + delay, outcome)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._events:
+                        wait = self._events[0][0] - time.monotonic()
+                        if wait <= 0:
+                            _, _, action = heapq.heappop(self._events)
+                            break
+                    elif self._closed and not self._outstanding:
+                        return
+                    else:
+                        wait = None
+                    self._cond.wait(timeout=wait)
+            try:
+                action()
+            except Exception as e:
+                logger.error(f"Network emulator event failed: {e}")
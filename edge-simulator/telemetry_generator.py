@@ -0,0 +1,398 @@
+"""
+F1 Telemetry Edge Simulator - Synthetic Car Telemetry
+Generates high-frequency per-car channels (speed, RPM, throttle, brake, gear,
+DRS, GPS) shaped by the cached lap times and pit stops, using batched NumPy
+operations so a single process can produce millions of samples per second
+"""
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bahrain International Circuit (clockwise), distances from the start line
+LAP_LENGTH_M = 5412.0
+CIRCUIT_ORIGIN = (26.0325, 50.5106)  # lat, lon
+# (apex distance m, apex speed km/h, heading change deg; negative = right-hander)
+CORNERS = [
+    (620, 80, -100), (760, 150, 40), (900, 230, -30), (1450, 120, -95),
+    (1800, 210, 45), (1900, 200, -50), (2050, 190, 40), (2300, 110, -110),
+    (2750, 130, 70), (2950, 95, 120), (3700, 170, -75), (4000, 250, -35),
+    (4300, 120, -95), (5000, 110, -100), (5150, 170, -40),
+]
+DRS_ZONES = [(5250, LAP_LENGTH_M), (0, 550), (1000, 1400), (3050, 3600)]
+DRS_FROM_LAP = 3
+
+V_MAX = 330 / 3.6
+GEAR_TOP_SPEEDS_KMH = np.array([95, 130, 160, 190, 225, 260, 295, 340], dtype=np.float32)
+RPM_IDLE = 4000
+RPM_MAX = 12500
+
+PIT_LANE_LENGTH_M = 400.0
+PIT_LANE_SPEED = 80 / 3.6
+
+N_CARS = 20
+
+# Channel -> dtype of the generated column
+CHANNELS = {
+    "car": np.uint8,
+    "t_us": np.uint32,
+    "lap": np.uint16,
+    "distance": np.float32,
+    "speed": np.float32,
+    "rpm": np.uint16,
+    "throttle": np.uint8,
+    "brake": np.uint8,
+    "gear": np.int8,
+    "drs": np.uint8,
+    "lat": np.float64,
+    "lon": np.float64,
+}
+
+
+def _lap_seconds(value: str) -> float:
+    """'1:33.234' -> 93.234"""
+    minutes, _, seconds = value.rpartition(":")
+    return (int(minutes) * 60 if minutes else 0) + float(seconds)
+
+
+class TrackModel:
+    """Reference lap: per-metre speed, pedal, gear and GPS tables for one circuit"""
+
+    def __init__(self, step_m: float = 1.0):
+        self.distance = np.arange(0.0, LAP_LENGTH_M, step_m)
+        n = len(self.distance)
+
+        # Corner speed caps, applied over a short apex window
+        cap = np.full(n, V_MAX)
+        for apex, speed_kmh, _ in CORNERS:
+            window = np.abs(self.distance - apex) <= 15
+            cap[window] = np.minimum(cap[window], speed_kmh / 3.6)
+
+        # Acceleration/braking envelopes over three laps so the profile wraps
+        caps = np.tile(cap, 3)
+        v = caps.copy()
+        for i in range(1, len(v)):
+            accel = 12.0 * (1 - (v[i - 1] / V_MAX) ** 2)
+            v[i] = min(v[i], np.sqrt(v[i - 1] ** 2 + 2 * accel * step_m))
+        for i in range(len(v) - 2, -1, -1):
+            decel = 25.0 + 25.0 * (v[i + 1] / V_MAX) ** 2
+            v[i] = min(v[i], np.sqrt(v[i + 1] ** 2 + 2 * decel * step_m))
+        self.speed = v[n:2 * n]
+
+        dv = np.diff(v[n:2 * n + 1])
+        decel = np.clip(-dv * self.speed / step_m, 0, None)
+        self.throttle = np.where(dv > 1e-3, 100.0, np.where(dv < -1e-3, 0.0, 45.0))
+        self.throttle[self.speed >= V_MAX - 0.5] = 100.0
+        self.brake = np.clip(decel / 50.0 * 100.0, 0, 100)
+
+        # Time to reach each distance on the reference lap
+        segment = step_m / self.speed
+        self.time_at_distance = np.concatenate(([0.0], np.cumsum(segment)[:-1]))
+        self.lap_time = float(segment.sum())
+
+        self.lat, self.lon = self._centerline(step_m)
+
+        drs = np.zeros(n, dtype=bool)
+        for start, end in DRS_ZONES:
+            drs |= (self.distance >= start) & (self.distance < end)
+        self.drs_zone = drs
+
+    def _centerline(self, step_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Integrate corner heading changes into a closed loop and project it to GPS"""
+        angles = np.array([c[2] for c in CORNERS], dtype=float)
+        angles *= -360.0 / angles.sum()  # clockwise loop closes after -360 degrees
+        turn_rate = np.zeros_like(self.distance)
+        for (apex, _, _), angle in zip(CORNERS, angles):
+            # Spread each corner's heading change over ~80 m around the apex
+            weight = np.exp(-0.5 * ((self.distance - apex) / 20.0) ** 2)
+            turn_rate += np.radians(angle) * weight / weight.sum()
+        heading = np.cumsum(turn_rate)
+        x = np.cumsum(np.cos(heading)) * step_m
+        y = np.cumsum(np.sin(heading)) * step_m
+        # Distribute the residual closure error along the lap
+        fraction = self.distance / LAP_LENGTH_M
+        x -= fraction * x[-1]
+        y -= fraction * y[-1]
+
+        lat0, lon0 = CIRCUIT_ORIGIN
+        lat = lat0 + y / 111_320.0
+        lon = lon0 + x / (111_320.0 * np.cos(np.radians(lat0)))
+        return lat, lon
+
+
+@dataclass
+class TelemetryFrame:
+    """A time slice of samples for all cars, one column per channel (time-major rows)"""
+    base_time: float
+    rate_hz: float
+    car_ids: List[str]
+    channels: Dict[str, np.ndarray]
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.channels["car"])
+
+    def to_payload(self) -> Dict[str, Any]:
+        """JSON-serializable form for the standard telemetry envelope"""
+        return {
+            "base_time": self.base_time,
+            "rate_hz": self.rate_hz,
+            "car_ids": self.car_ids,
+            "sample_count": self.sample_count,
+            "channels": {name: column.tolist() for name, column in self.channels.items()},
+        }
+
+
+class CarTelemetryGenerator:
+    """
+    Synthesizes per-car channels for a full race. Each car follows the
+    reference lap scaled to its own lap time on every lap (interpolated from
+    the cached lap timings), serves its cached pit stops, and is parked once
+    it has completed race distance.
+    """
+
+    def __init__(
+        self,
+        race_data: Dict[str, Any],
+        rate_hz: float = 50.0,
+        n_cars: int = N_CARS,
+        seed: Optional[int] = None,
+        track: Optional[TrackModel] = None
+    ):
+        self.rate_hz = rate_hz
+        self.n_cars = n_cars
+        self.track = track or TrackModel()
+        self.rng = np.random.default_rng(seed)
+
+        self.total_laps = self._race_laps(race_data)
+        self.car_ids, lap_times = self._lap_times(race_data)
+        pit_stationary = self._pit_stops(race_data)
+
+        # Per-car per-lap time scale relative to the reference lap
+        self.lap_scale = lap_times / self.track.lap_time
+        lane_ref_time = np.interp(PIT_LANE_LENGTH_M, self.track.distance, self.track.time_at_distance)
+        self.pit_stationary = pit_stationary
+        self.pit_lane_time = PIT_LANE_LENGTH_M / PIT_LANE_SPEED
+        self.pit_lane_ref_time = float(lane_ref_time)
+        pit_laps = pit_stationary > 0
+        durations = lap_times + np.where(
+            pit_laps, pit_stationary + self.pit_lane_time - self.lap_scale * lane_ref_time, 0.0
+        )
+
+        # lap_starts[c, l] = race time at which car c starts lap l (last column = finish)
+        self.lap_starts = np.zeros((n_cars, self.total_laps + 1))
+        self.lap_starts[:, 1:] = np.cumsum(durations, axis=1)
+        self.race_end = float(self.lap_starts[:, -1].max())
+
+        # Flattened, per-car offset copy of lap_starts for one vectorized searchsorted
+        self._car_span = self.race_end + 1.0
+        self._car_offsets = np.arange(n_cars) * self._car_span
+        self._flat_starts = (self.lap_starts + self._car_offsets[:, None]).ravel()
+
+    def _race_laps(self, race_data: Dict[str, Any]) -> int:
+        try:
+            results = race_data["results"]["MRData"]["RaceTable"]["Races"][0]["Results"]
+            return max(int(r["laps"]) for r in results)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return 57
+
+    def _lap_times(self, race_data: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+        """Per-car lap times (n_cars, total_laps), interpolated from the cached timings"""
+        laps = np.arange(1, self.total_laps + 1)
+        per_driver: Dict[str, List[Tuple[int, float]]] = {}
+        try:
+            for lap in race_data["laps"]["MRData"]["RaceTable"]["Races"][0]["Laps"]:
+                for timing in lap["Timings"]:
+                    per_driver.setdefault(timing["driverId"], []).append(
+                        (int(lap["number"]), _lap_seconds(timing["time"]))
+                    )
+        except (KeyError, IndexError, TypeError):
+            logger.warning("No cached lap timings, using reference lap for all cars")
+
+        car_ids = list(per_driver)[:self.n_cars]
+        times = np.empty((self.n_cars, self.total_laps))
+        for i, driver in enumerate(car_ids):
+            known = sorted(per_driver[driver])
+            times[i] = np.interp(laps, [k[0] for k in known], [k[1] for k in known])
+
+        # Fill the rest of the grid just behind the slowest known car
+        known = len(car_ids)
+        baseline = times[:known].max(axis=0) if known else np.full(self.total_laps, self.track.lap_time)
+        for i in range(known, self.n_cars):
+            car_ids.append(f"car_{i + 1:02d}")
+            times[i] = baseline + 0.12 * (i - known + 1) + self.rng.uniform(0, 0.3)
+
+        times += self.rng.normal(0, 0.15, size=times.shape)
+        return car_ids, times
+
+    def _pit_stops(self, race_data: Dict[str, Any]) -> np.ndarray:
+        """Stationary time (n_cars, total_laps), non-zero on laps where a car pits"""
+        stationary = np.zeros((self.n_cars, self.total_laps))
+        index = {driver: i for i, driver in enumerate(self.car_ids)}
+        served = set()
+        try:
+            for stop in race_data["pitstops"]["MRData"]["RaceTable"]["Races"][0]["PitStops"]:
+                car = index.get(stop["driverId"])
+                lap = int(stop["lap"])
+                if car is not None and 1 <= lap <= self.total_laps:
+                    stationary[car, lap - 1] = float(stop["duration"])
+                    served.add(car)
+        except (KeyError, IndexError, TypeError, ValueError):
+            logger.warning("No cached pit stops, synthesizing two-stop strategies")
+
+        # Two-stop strategy for cars without cached stops
+        for car in range(self.n_cars):
+            if car not in served:
+                for window in ((15, 23), (35, 43)):
+                    lap = int(self.rng.integers(*window))
+                    if lap <= self.total_laps:
+                        stationary[car, lap - 1] = self.rng.uniform(2.3, 3.1)
+        return stationary
+
+    def generate(self, t0: float, n_steps: int) -> Dict[str, np.ndarray]:
+        """
+        Channels for all cars at race times t0 + i/rate_hz, flattened
+        time-major. Times past race_end show every car parked at the finish.
+        """
+        track = self.track
+        steps = np.arange(n_steps)
+        t = np.minimum(t0 + steps / self.rate_hz, self.race_end)
+
+        # Locate every (time, car) sample in its lap with one searchsorted
+        q = t[:, None] + self._car_offsets[None, :]
+        flat = np.searchsorted(self._flat_starts, q, side="right") - 1
+        car = np.broadcast_to(np.arange(self.n_cars, dtype=np.int32), q.shape)
+        lap_idx = flat - car * (self.total_laps + 1)
+        finished = lap_idx >= self.total_laps
+        lap_idx = np.minimum(lap_idx, self.total_laps - 1)
+        tau = q - self._flat_starts[flat]
+
+        scale = self.lap_scale[car, lap_idx]
+        stationary = self.pit_stationary[car, lap_idx]
+        in_box = tau < stationary
+        in_lane = ~in_box & (tau < stationary + self.pit_lane_time) & (stationary > 0)
+        racing = ~(in_box | in_lane | finished)
+
+        # Time on the reference lap, shifted past the pit lane on pit laps
+        ref_time = np.where(
+            stationary > 0,
+            (tau - stationary - self.pit_lane_time) / scale + self.pit_lane_ref_time,
+            tau / scale
+        )
+        distance = np.interp(ref_time, track.time_at_distance, track.distance)
+        distance = np.where(in_lane, (tau - stationary) * PIT_LANE_SPEED, distance)
+        distance = np.where(in_box | finished, 0.0, distance)
+
+        speed = np.interp(distance, track.distance, track.speed) / scale * 3.6
+        speed = np.where(racing, speed + self.rng.normal(0, 0.5, q.shape), 0.0)
+        speed = np.where(in_lane, PIT_LANE_SPEED * 3.6, speed)
+        speed = np.clip(speed, 0, None)
+
+        throttle = np.interp(distance, track.distance, track.throttle)
+        throttle = np.clip(throttle + self.rng.normal(0, 1.5, q.shape), 0, 100)
+        throttle = np.where(racing, throttle, np.where(in_lane, 25.0, 0.0))
+        brake = np.where(racing, np.interp(distance, track.distance, track.brake), 0.0)
+
+        gear = np.minimum(np.searchsorted(GEAR_TOP_SPEEDS_KMH, speed) + 1, len(GEAR_TOP_SPEEDS_KMH))
+        gear = np.where(speed < 1.0, 0, gear)
+        top = GEAR_TOP_SPEEDS_KMH[np.maximum(gear - 1, 0)]
+        rpm = RPM_IDLE + (RPM_MAX - RPM_IDLE) * np.clip(speed / top, 0, 1)
+        rpm = np.clip(rpm + self.rng.normal(0, 60, q.shape), RPM_IDLE, RPM_MAX)
+
+        zone = np.interp(distance, track.distance, track.drs_zone.astype(np.float32)) > 0.5
+        drs = racing & zone & (lap_idx + 1 >= DRS_FROM_LAP) & (throttle > 90)
+
+        lat = np.interp(distance, track.distance, track.lat)
+        lon = np.interp(distance, track.distance, track.lon)
+
+        t_us = np.broadcast_to((steps * (1_000_000 / self.rate_hz)).astype(np.uint32)[:, None], q.shape)
+        columns = {
+            "car": car,
+            "t_us": t_us,
+            "lap": lap_idx + 1,
+            "distance": distance,
+            "speed": speed,
+            "rpm": rpm,
+            "throttle": throttle,
+            "brake": brake,
+            "gear": gear,
+            "drs": drs,
+            "lat": lat,
+            "lon": lon,
+        }
+        return {name: np.ascontiguousarray(columns[name], dtype=dtype).ravel() for name, dtype in CHANNELS.items()}
+
+    def frames(
+        self,
+        frame_seconds: float = 1.0,
+        start_time: Optional[float] = None,
+        realtime: bool = True,
+        loop: bool = False
+    ) -> Iterator[TelemetryFrame]:
+        """
+        Yield consecutive frames of frame_seconds each until the last car has
+        finished (the final frame covers race_end). With loop, the race instead
+        restarts from lap 1 while frame times keep advancing, for soak tests.
+        With realtime, frames are paced to wall-clock time; otherwise they are
+        produced as fast as possible (for load tests and benchmarks).
+        """
+        start_time = time.time() if start_time is None else start_time
+        steps_per_frame = max(1, int(round(frame_seconds * self.rate_hz)))
+        step = 0
+        # Steps since the start of the current race
+        race_step = 0
+        while True:
+            if race_step / self.rate_hz > self.race_end:
+                if not loop:
+                    return
+                race_step = 0
+            frame = TelemetryFrame(
+                base_time=start_time + step / self.rate_hz,
+                rate_hz=self.rate_hz,
+                car_ids=self.car_ids,
+                channels=self.generate(race_step / self.rate_hz, steps_per_frame)
+            )
+            step += steps_per_frame
+            race_step += steps_per_frame
+            if realtime:
+                delay = start_time + step / self.rate_hz - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            yield frame
+
+
+def _benchmark(argv: Optional[List[str]] = None):
+    from main import CachedDataReplayer
+
+    parser = argparse.ArgumentParser(description="Benchmark synthetic car telemetry generation")
+    parser.add_argument("--cache-dir", default="cache-data")
+    parser.add_argument("--rate", type=float, default=100.0)
+    parser.add_argument("--frame-seconds", type=float, default=10.0)
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    replayer = CachedDataReplayer(cache_dir=args.cache_dir)
+    generator = CarTelemetryGenerator(replayer.race_data, rate_hz=args.rate, seed=1)
+    logger.info(
+        f"Reference lap {generator.track.lap_time:.3f}s, {generator.total_laps} laps, "
+        f"race end {generator.race_end:.0f}s, cars: {', '.join(generator.car_ids)}"
+    )
+
+    started = time.perf_counter()
+    samples = 0
+    for i, frame in enumerate(generator.frames(args.frame_seconds, start_time=0.0, realtime=False, loop=True)):
+        samples += frame.sample_count
+        if i + 1 >= args.frames:
+            break
+    elapsed = time.perf_counter() - started
+    logger.info(f"Generated {samples:,} samples in {elapsed:.2f}s ({samples / elapsed:,.0f} samples/s)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _benchmark()
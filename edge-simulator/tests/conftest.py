@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The simulator modules are flat scripts (imported as `adaptive_sender`, ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
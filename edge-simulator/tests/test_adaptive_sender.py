@@ -0,0 +1,199 @@
+import gzip
+from concurrent.futures import Future
+
+from adaptive_sender import (
+    ROUTE_BATCH, ROUTE_FRAMES, ROUTE_SINGLE, AdaptiveSender, EncodedFrame, LinkMonitor, LinkQuality
+)
+from network_emulator import LinkBusy
+
+
+class FakeTransport:
+    """Records calls; fails while down"""
+
+    def __init__(self):
+        self.calls = []
+        self.down = False
+
+    def __call__(self, route, body, headers):
+        self.calls.append((route, body, headers))
+        return not self.down
+
+
+def envelope(data_type: str, n: int = 0):
+    return {"data_type": data_type, "payload": {"n": n}, "metadata": {"trace_id": f"t{n}"}}
+
+
+def frame(n: int = 0, size: int = 100):
+    return EncodedFrame(data_type="car_telemetry", body=bytes(size), content_type="application/x-test", trace_id=f"f{n}")
+
+
+def test_monitor_needs_min_samples_before_bad():
+    monitor = LinkMonitor()
+    monitor.record_failure(0.1)
+    assert monitor.quality == LinkQuality.DEGRADED
+    for _ in range(3):
+        monitor.record_failure(0.1)
+    assert monitor.quality == LinkQuality.BAD
+
+
+def test_monitor_recovers_on_success():
+    monitor = LinkMonitor()
+    for _ in range(4):
+        monitor.record_failure(0.1)
+    for _ in range(20):
+        monitor.record_success(0.01, 100)
+    assert monitor.quality == LinkQuality.GOOD
+
+
+def test_good_link_sends_immediately():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport)
+    assert sender.submit(envelope("lap_times"))
+    assert [call[0] for call in transport.calls] == [ROUTE_SINGLE]
+    assert sender.pending == 0
+
+
+def test_single_failure_does_not_stall_telemetry():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, probe_interval=3600)
+    transport.down = True
+    sender.submit(frame())
+    transport.down = False
+
+    for i in range(600):
+        sender.submit(frame(i))
+
+    assert sender.monitor.quality == LinkQuality.GOOD
+    assert len(transport.calls) > 100
+    assert sender.pending == 0
+
+
+def test_probe_recovers_bad_link():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, probe_interval=0)
+    for _ in range(4):
+        sender.monitor.record_failure(0.1)
+    assert sender.monitor.quality == LinkQuality.BAD
+
+    # Car telemetry is deferred on a bad link; probes carry it and re-measure
+    for i in range(20):
+        sender.submit(frame(i))
+
+    assert sender.monitor.quality != LinkQuality.BAD
+    assert transport.calls
+
+
+def test_no_probe_before_interval():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, probe_interval=3600)
+    for _ in range(4):
+        sender.monitor.record_failure(0.1)
+
+    for i in range(10):
+        sender.submit(frame(i))
+
+    assert transport.calls == []
+    assert sender.pending == 10
+
+
+def test_degraded_link_batches_and_compresses():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, probe_interval=3600)
+    sender.monitor.record_failure(0.1)
+    assert sender.monitor.quality == LinkQuality.DEGRADED
+
+    for i in range(4):
+        sender.submit(envelope("race_results", i))
+
+    [(route, _body, headers)] = transport.calls
+    assert route == ROUTE_BATCH
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["X-Trace-ID"] == "t0,t1,t2,t3"
+
+
+def test_frames_and_envelopes_use_separate_routes():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport)
+    sender.monitor.record_failure(0.1)
+    sender.submit(frame(1))
+    sender.submit(envelope("race_results", 1))
+
+    sender.flush(force=True)
+
+    assert sorted(call[0] for call in transport.calls) == [ROUTE_BATCH, ROUTE_FRAMES]
+
+
+def test_batches_are_capped_in_bytes():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, max_batch_bytes=1000, probe_interval=3600)
+    sender.monitor.record_failure(0.1)
+
+    for i in range(4):
+        sender.submit(frame(i, size=400))
+
+    # 4 x 400 bytes, at most 1000 bytes per batch
+    assert len(transport.calls) == 2
+
+
+def test_failed_flush_requeues_in_order():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, probe_interval=3600)
+    sender.monitor.record_failure(0.1)
+    transport.down = True
+    for i in range(4):
+        sender.submit(envelope("race_results", i))
+    assert sender.pending == 4
+
+    transport.down = False
+    sender.flush(force=True)
+    assert sender.pending == 0
+    assert transport.calls[-1][2]["X-Trace-ID"] == "t0,t1,t2,t3"
+
+
+def test_async_failure_requeues_through_bounded_queue():
+    futures = []
+
+    def transport(route, body, headers):
+        future = Future()
+        futures.append(future)
+        return future
+
+    sender = AdaptiveSender(transport, max_pending=4, probe_interval=3600)
+    sender.monitor.record_failure(0.1)
+    for i in range(4):
+        sender.submit(envelope("race_results", i))
+    for i in range(3):
+        sender.submit(envelope("race_results", 10 + i))
+    assert sender.in_flight == 4
+
+    futures[0].set_result(False)
+
+    # The failed batch goes back to the head of the queue, which stays bounded
+    assert sender.in_flight == 0
+    assert sender.pending == 4
+
+
+def test_standings_supersede_each_other():
+    transport = FakeTransport()
+    sender = AdaptiveSender(transport, probe_interval=3600)
+    sender.monitor.record_failure(0.1)
+
+    sender.submit(envelope("driver_standings", 1))
+    sender.submit(envelope("driver_standings", 2))
+
+    assert sender.pending == 1
+    sender.flush(force=True)
+    [(route, body, _headers)] = transport.calls
+    assert b'"n": 2' in gzip.decompress(body)
+
+
+def test_refused_send_keeps_batch_queued():
+    def transport(route, body, headers):
+        future = Future()
+        future.set_exception(LinkBusy("send buffer full"))
+        return future
+
+    sender = AdaptiveSender(transport, probe_interval=3600)
+    sender.submit(envelope("race_results", 0))
+    assert sender.in_flight == 0
+    assert sender.pending == 1
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from network_emulator import LinkBusy, LinkModel, NetworkEmulator
+
+
+class SlowLink(LinkModel):
+    """Every request takes an hour to arrive (an outage)"""
+
+    def transmit(self, nbytes, now, elapsed, rng):
+        return 3600.0
+
+
+def test_outstanding_requests_are_capped():
+    emulator = NetworkEmulator(SlowLink(), max_outstanding=3)
+    futures = [emulator.submit(lambda: True, 100) for _ in range(3)]
+    assert not any(future.done() for future in futures)
+
+    refused = emulator.submit(lambda: True, 100)
+    assert refused.done()
+    with pytest.raises(LinkBusy):
+        refused.result()
+    emulator.close(wait=False)
+
+
+def test_capacity_returns_when_requests_complete():
+    release = threading.Event()
+    emulator = NetworkEmulator(LinkModel(), max_outstanding=1)
+    first = emulator.submit(release.wait, 100)
+    # Callbacks run in order, so this one fires after the emulator's own
+    completed = threading.Event()
+    first.add_done_callback(lambda _: completed.set())
+    assert isinstance(emulator.submit(lambda: True, 100).exception(), LinkBusy)
+
+    release.set()
+    assert completed.wait(timeout=5) and first.result()
+    assert emulator.submit(lambda: True, 100).result(timeout=5)
+    emulator.close()
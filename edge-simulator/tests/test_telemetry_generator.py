@@ -0,0 +1,34 @@
+import itertools
+
+import numpy as np
+
+from telemetry_generator import CarTelemetryGenerator
+
+
+def make_generator():
+    # No cached race: 57 synthesized laps for the whole grid
+    return CarTelemetryGenerator({}, rate_hz=1.0, seed=1)
+
+
+def test_frames_stop_at_race_distance():
+    generator = make_generator()
+    frames = list(generator.frames(frame_seconds=60.0, start_time=0.0, realtime=False))
+
+    assert frames[-1].base_time <= generator.race_end < frames[-1].base_time + 60.0
+    laps = np.stack([frame.channels["lap"].reshape(-1, generator.n_cars) for frame in frames]).reshape(-1, generator.n_cars)
+    # Laps never go back to 1 and every car ends parked on its final lap
+    assert (np.diff(laps.astype(int), axis=0) >= 0).all()
+    assert (laps[-1] == generator.total_laps).all()
+    assert (frames[-1].channels["speed"].reshape(-1, generator.n_cars)[-1] == 0).all()
+
+
+def test_loop_restarts_the_race():
+    generator = make_generator()
+    n_race = sum(1 for _ in generator.frames(frame_seconds=60.0, start_time=0.0, realtime=False))
+    frames = list(itertools.islice(
+        generator.frames(frame_seconds=60.0, start_time=0.0, realtime=False, loop=True), n_race + 1
+    ))
+
+    # Frame times keep advancing while the race starts again from lap 1
+    assert frames[n_race].base_time == n_race * 60.0
+    assert (frames[n_race].channels["lap"] == 1).all()
@@ -0,0 +1,450 @@
+"""
+F1 Telemetry Ingestion Service - Bulk Backfill
+Loads a directory of historical Ergast JSON files (any number of seasons) into
+raw telemetry storage, either through a running ingestion service or straight
+to S3, with parallel parsing, concurrent uploads and resumable checkpoints.
+
+Usage:
+    python backfill.py /data/ergast --target http://localhost:8000
+    python backfill.py /data/ergast --target s3 --workers 8 --uploads 32
+"""
+import os
+import gzip
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from models import TelemetryPayload
+from storage import S3Storage
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("backfill")
+
+BACKFILL_SOURCE = "ergast-backfill"
+BACKFILL_VERSION = "1.0.0"
+
+# Races[0] key -> data_type, in the same vocabulary the edge simulator uses
+RACE_TABLE_TYPES = [
+    ("Laps", "lap_times"),
+    ("PitStops", "pit_stops"),
+    ("QualifyingResults", "qualifying"),
+    ("FastestLaps", "fastest_laps"),
+    ("Results", "race_results"),
+]
+STANDINGS_TYPES = [
+    ("DriverStandings", "driver_standings"),
+    ("ConstructorStandings", "constructor_standings"),
+]
+
+
+@dataclass
+class ParsedFile:
+    """Result of parsing one Ergast file in a worker process"""
+    path: str
+    data_type: Optional[str] = None
+    race: Optional[Tuple[str, str]] = None
+    # Serialized TelemetryPayload when the file carries its own race date
+    body: Optional[str] = None
+    # Envelope without a timestamp (standings have no date); resolved later
+    envelope: Optional[Dict[str, Any]] = None
+    race_time: Optional[str] = None
+    page: int = 0
+    error: Optional[str] = None
+
+
+def classify(document: Dict[str, Any]) -> Tuple[Optional[str], Optional[Tuple[str, str]], Optional[Dict[str, Any]]]:
+    """(data_type, (season, round), race or standings list) of an Ergast document"""
+    mrdata = document.get("MRData", {})
+
+    table = mrdata.get("RaceTable")
+    if table and table.get("Races"):
+        race = table["Races"][0]
+        key = (str(race.get("season", table.get("season"))), str(race.get("round", table.get("round"))))
+        for field_name, data_type in RACE_TABLE_TYPES:
+            if field_name in race:
+                if data_type == "race_results" and "/fastest/" in mrdata.get("url", ""):
+                    data_type = "fastest_laps"
+                return data_type, key, race
+
+    table = mrdata.get("StandingsTable")
+    if table and table.get("StandingsLists"):
+        standings = table["StandingsLists"][0]
+        key = (str(standings.get("season", table.get("season"))), str(standings.get("round", table.get("round"))))
+        for field_name, data_type in STANDINGS_TYPES:
+            if field_name in standings:
+                return data_type, key, None
+
+    return None, None, None
+
+
+def race_time(race: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Race start as an ISO timestamp, from the Ergast date and (optional) time"""
+    if not race or "date" not in race:
+        return None
+    start = race.get("time", "00:00:00Z").rstrip("Z")
+    return f"{race['date']}T{start}"
+
+
+def timestamp_for(start: str, page: int) -> str:
+    """
+    Envelope timestamp: the race start plus the page offset in microseconds.
+    Storage keys are edge_id + timestamp, so this keeps paginated documents of
+    the same race apart and makes re-running a backfill overwrite, not duplicate.
+    """
+    return (datetime.fromisoformat(start) + timedelta(microseconds=page)).isoformat() + "Z"
+
+
+def parse_file(path: str, edge_id: str) -> ParsedFile:
+    """Parse one file and build its envelope (runs in a worker process)"""
+    try:
+        with open(path, "r") as f:
+            document = json.load(f)
+    except (OSError, ValueError) as e:
+        return ParsedFile(path=path, error=f"unreadable: {e}")
+
+    data_type, race_key, race = classify(document)
+    if data_type is None:
+        return ParsedFile(path=path, error="not a recognised Ergast race or standings document")
+
+    page = int(document["MRData"].get("offset", 0) or 0)
+    envelope = {
+        "edge_id": edge_id,
+        "data_type": data_type,
+        "payload": document,
+        "metadata": {
+            "collection_time": datetime.utcnow().isoformat() + "Z",
+            "source": BACKFILL_SOURCE,
+            "version": BACKFILL_VERSION,
+        },
+    }
+    parsed = ParsedFile(path=path, data_type=data_type, race=race_key, race_time=race_time(race), page=page)
+
+    if parsed.race_time is None:
+        parsed.envelope = envelope
+        return parsed
+
+    envelope["timestamp"] = timestamp_for(parsed.race_time, page)
+    try:
+        parsed.body = TelemetryPayload.model_validate(envelope).model_dump_json()
+    except ValueError as e:
+        return ParsedFile(path=path, error=f"invalid envelope: {e}")
+    return parsed
+
+
+def parse_chunk(paths: List[str], edge_id: str) -> List[ParsedFile]:
+    return [parse_file(path, edge_id) for path in paths]
+
+
+def discover(root: str) -> List[str]:
+    """All .json files under root, in a stable order"""
+    paths = []
+    for directory, _dirs, files in os.walk(root):
+        paths.extend(os.path.join(directory, name) for name in files if name.endswith(".json"))
+    return sorted(paths)
+
+
+class Checkpoint:
+    """
+    Append-only log of files that have been stored. Lines are appended as
+    uploads complete, so an interrupted backfill resumes where it stopped.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    self.done = {line.rstrip("\n") for line in f if line.strip()}
+            self._file = open(path, "a")
+
+    def mark(self, paths: List[str]):
+        if not self._file:
+            return
+        with self._lock:
+            self._file.write("".join(f"{path}\n" for path in paths))
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+@dataclass
+class Progress:
+    """Throughput counters, reported periodically"""
+    total: int
+    files: int = 0
+    bytes: int = 0
+    failed: int = 0
+    skipped: int = 0
+    started: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, files: int = 0, nbytes: int = 0, failed: int = 0, skipped: int = 0):
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+            self.failed += failed
+            self.skipped += skipped
+
+    def report(self, final: bool = False):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        logger.info(
+            f"{'🏁' if final else '📈'} {self.files}/{self.total} files stored, "
+            f"{self.files / elapsed:.0f} files/s, {self.bytes / elapsed / 1e6:.1f} MB/s, "
+            f"{self.failed} failed, {self.skipped} skipped ({elapsed:.0f}s)"
+        )
+
+
+class HttpSink:
+    """Pushes envelopes to a running ingestion service in gzip batches"""
+
+    def __init__(self, base_url: str, batch_size: int, pool_size: int, edge_id: str = "ergast-backfill"):
+        self.endpoint = f"{base_url.rstrip('/')}/api/v1/telemetry/batch"
+        # Every envelope of a run carries the same edge_id; the service shards by it
+        self.edge_id = edge_id
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        retry_strategy = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["POST"]
+        )
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def store(self, bodies: List[str]) -> bool:
+        body = gzip.compress(("[" + ",".join(bodies) + "]").encode("utf-8"), compresslevel=5)
+        try:
+            response = self.session.post(
+                self.endpoint,
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "Content-Encoding": "gzip",
+                    "X-Edge-ID": self.edge_id,
+                },
+                timeout=60
+            )
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Batch of {len(bodies)} rejected: {e}")
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+class StorageSink:
+    """
+    Writes envelopes straight to the raw telemetry bucket, as the service would:
+    same keys, manifests and rollups as a backfill through the service
+    """
+
+    def __init__(self, bucket_name: str, region: str, manifest_enabled: bool, rollups_enabled: bool = True):
+        self.storage = S3Storage(
+            bucket_name=bucket_name,
+            region=region,
+            manifest_enabled=manifest_enabled,
+            rollups_enabled=rollups_enabled
+        )
+        if not self.storage.s3_client:
+            raise RuntimeError("S3 client could not be initialised")
+        self.batch_size = 1
+
+    def store(self, bodies: List[str]) -> bool:
+        return all(
+            self.storage.store_telemetry(TelemetryPayload.model_validate_json(body))
+            for body in bodies
+        )
+
+    def close(self):
+        self.storage.close()
+
+
+class Backfill:
+    """
+    Parses files in a process pool and uploads the resulting envelopes from a
+    thread pool. In-flight parses and uploads are both bounded so that parsing
+    can never run far ahead of storage.
+    """
+
+    def __init__(
+        self,
+        sink,
+        checkpoint: Checkpoint,
+        edge_id: str = "ergast-backfill",
+        workers: int = os.cpu_count() or 4,
+        uploads: int = 16,
+        chunk_size: int = 16,
+        report_interval: float = 10.0
+    ):
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.edge_id = edge_id
+        self.workers = workers
+        self.uploads = uploads
+        self.chunk_size = chunk_size
+        self.report_interval = report_interval
+        self._slots = threading.BoundedSemaphore(uploads * 2)
+        self._pending: List[ParsedFile] = []
+        self._deferred: List[ParsedFile] = []
+        self._race_times: Dict[Tuple[str, str], str] = {}
+
+    def run(self, root: str) -> Progress:
+        paths = [path for path in discover(root) if os.path.relpath(path, root) not in self.checkpoint.done]
+        progress = Progress(total=len(paths))
+        progress.skipped = len(self.checkpoint.done)
+        logger.info(f"🚀 Backfilling {len(paths)} files from {root} ({progress.skipped} already done)")
+
+        chunks = (paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size))
+        last_report = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as parsers, \
+                ThreadPoolExecutor(max_workers=self.uploads) as uploaders:
+            # Submit through a window of parses, consumed in order, so parsed
+            # chunks never pile up ahead of the uploads
+            window: deque = deque()
+            for chunk in chunks:
+                window.append(parsers.submit(parse_chunk, chunk, self.edge_id))
+                if len(window) < self.workers * 2:
+                    continue
+                self._accept_chunk(window.popleft().result(), root, progress, uploaders)
+                if time.monotonic() - last_report >= self.report_interval:
+                    progress.report()
+                    last_report = time.monotonic()
+            while window:
+                self._accept_chunk(window.popleft().result(), root, progress, uploaders)
+
+            # Standings carry no date: place them at the start of their race
+            for parsed in self._deferred:
+                self._accept(self._resolve(parsed), root, progress, uploaders)
+            self._drain(root, progress, uploaders)
+
+        self.sink.close()
+        self.checkpoint.close()
+        progress.report(final=True)
+        return progress
+
+    def _accept_chunk(self, parsed_chunk: List[ParsedFile], root: str, progress: Progress, uploaders: ThreadPoolExecutor):
+        for parsed in parsed_chunk:
+            self._accept(parsed, root, progress, uploaders)
+
+    def _accept(self, parsed: ParsedFile, root: str, progress: Progress, uploaders: ThreadPoolExecutor):
+        if parsed.error:
+            logger.warning(f"✗ Skipping {parsed.path}: {parsed.error}")
+            progress.add(skipped=1)
+            return
+        if parsed.race_time and parsed.race:
+            self._race_times.setdefault(parsed.race, parsed.race_time)
+        if parsed.body is None:
+            self._deferred.append(parsed)
+            return
+
+        self._pending.append(parsed)
+        if len(self._pending) >= self.sink.batch_size:
+            self._drain(root, progress, uploaders)
+
+    def _resolve(self, parsed: ParsedFile) -> ParsedFile:
+        season, round_ = parsed.race
+        start = self._race_times.get(parsed.race)
+        if not start:
+            # No dated document for the race: one synthetic day per round keeps
+            # the standings of different rounds on different keys
+            offset = timedelta(days=int(round_) if round_.isdigit() else 0)
+            start = (datetime.fromisoformat(f"{season}-01-01T00:00:00") + offset).isoformat()
+        parsed.envelope["timestamp"] = timestamp_for(start, parsed.page)
+        try:
+            parsed.body = TelemetryPayload.model_validate(parsed.envelope).model_dump_json()
+        except ValueError as e:
+            parsed.error = f"invalid envelope: {e}"
+        parsed.envelope = None
+        return parsed
+
+    def _drain(self, root: str, progress: Progress, uploaders: ThreadPoolExecutor):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._slots.acquire()
+        future = uploaders.submit(self.sink.store, [parsed.body for parsed in batch])
+        future.add_done_callback(lambda done: self._complete(done, batch, root, progress))
+
+    def _complete(self, future: Future, batch: List[ParsedFile], root: str, progress: Progress):
+        self._slots.release()
+        try:
+            ok = future.result()
+        except Exception as e:
+            logger.error(f"❌ Upload failed: {e}")
+            ok = False
+
+        if ok:
+            self.checkpoint.mark([os.path.relpath(parsed.path, root) for parsed in batch])
+            progress.add(files=len(batch), nbytes=sum(len(parsed.body) for parsed in batch))
+        else:
+            # Not checkpointed: picked up again on the next run
+            progress.add(failed=len(batch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical Ergast JSON files into raw telemetry storage")
+    parser.add_argument("source", help="Directory of Ergast JSON files (searched recursively)")
+    parser.add_argument("--target", default=os.environ.get("INGESTION_URL", "http://localhost:8000"),
+                        help="Ingestion service base URL, or 's3' to write straight to the bucket")
+    parser.add_argument("--bucket", default=os.environ.get("S3_BUCKET_NAME", "f1-telemetry-raw"))
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"))
+    parser.add_argument("--no-manifest", action="store_true", help="Do not update partition manifests (s3 target)")
+    parser.add_argument("--no-rollups", action="store_true", help="Do not update rollups (s3 target)")
+    parser.add_argument("--edge-id", default="ergast-backfill")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parser processes")
+    parser.add_argument("--uploads", type=int, default=16, help="Concurrent uploads")
+    parser.add_argument("--batch-size", type=int, default=32, help="Envelopes per request (http target)")
+    parser.add_argument("--checkpoint", default=".backfill-checkpoint",
+                        help="Progress file for resuming; '' to disable")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.target == "s3":
+        sink = StorageSink(
+            args.bucket,
+            args.region,
+            manifest_enabled=not args.no_manifest,
+            rollups_enabled=not args.no_rollups
+        )
+    else:
+        sink = HttpSink(args.target, batch_size=args.batch_size, pool_size=args.uploads, edge_id=args.edge_id)
+
+    backfill = Backfill(
+        sink,
+        Checkpoint(args.checkpoint or None),
+        edge_id=args.edge_id,
+        workers=args.workers,
+        uploads=args.uploads,
+        report_interval=args.report_interval
+    )
+    progress = backfill.run(args.source)
+    raise SystemExit(1 if progress.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+F1 Telemetry Ingestion Service - Binary Frame Decoding
+Zero-copy decoding of the versioned, column-packed sample frame content type
+"""
+import struct
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+FRAME_CONTENT_TYPE = "application/vnd.f1-telemetry.frame.v1"
+FRAME_MAGIC = b"F1TF"
+FRAME_VERSION = 1
+
+# magic, version, flags, schema_id, sample_count, base_time_us, edge_id length
+FRAME_HEADER = struct.Struct("<4sBBHIqB")
+
+# schema_id -> (data_type, [(channel, little-endian dtype)] in wire order).
+# Must match edge-simulator/frame_codec.py.
+FRAME_SCHEMAS: Dict[int, Tuple[str, List[Tuple[str, str]]]] = {
+    1: ("car_telemetry", [
+        ("lat", "<f8"), ("lon", "<f8"),
+        ("t_us", "<u4"), ("distance", "<f4"), ("speed", "<f4"),
+        ("lap", "<u2"), ("rpm", "<u2"),
+        ("car", "u1"), ("throttle", "u1"), ("brake", "u1"), ("gear", "i1"), ("drs", "u1"),
+    ]),
+}
+
+
+class FrameFormatError(ValueError):
+    """Raised for malformed or unsupported binary frames"""
+
+
+@dataclass
+class DecodedFrame:
+    """One decoded frame; columns are read-only views into the request body"""
+    edge_id: str
+    schema_id: int
+    data_type: str
+    base_time_us: int
+    sample_count: int
+    columns: Dict[str, np.ndarray]
+    raw: memoryview
+
+    @property
+    def time_range_us(self) -> Tuple[int, int]:
+        """(first, last) sample time in epoch microseconds"""
+        offsets = self.columns.get("t_us")
+        if offsets is None or not self.sample_count:
+            return self.base_time_us, self.base_time_us
+        return self.base_time_us + int(offsets.min()), self.base_time_us + int(offsets.max())
+
+
+def decode_frames(body: bytes) -> List[DecodedFrame]:
+    """Decode one or more concatenated frames without creating per-sample objects"""
+    buffer = memoryview(body)
+    frames = []
+    offset = 0
+
+    while offset < len(buffer):
+        if len(buffer) - offset < FRAME_HEADER.size:
+            raise FrameFormatError("Truncated frame header")
+        magic, version, _flags, schema_id, count, base_time_us, edge_len = FRAME_HEADER.unpack_from(buffer, offset)
+        if magic != FRAME_MAGIC:
+            raise FrameFormatError("Bad frame magic")
+        if version != FRAME_VERSION:
+            raise FrameFormatError(f"Unsupported frame version {version}")
+        if schema_id not in FRAME_SCHEMAS:
+            raise FrameFormatError(f"Unknown channel schema {schema_id}")
+
+        data_type, schema = FRAME_SCHEMAS[schema_id]
+        edge_start = offset + FRAME_HEADER.size
+        try:
+            edge_id = bytes(buffer[edge_start:edge_start + edge_len]).decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise FrameFormatError(f"Edge ID is not UTF-8: {e}")
+        position = offset + (FRAME_HEADER.size + edge_len + 7) // 8 * 8
+
+        frame_end = position + count * sum(np.dtype(dtype).itemsize for _, dtype in schema)
+        if frame_end > len(buffer):
+            raise FrameFormatError("Truncated frame body")
+
+        columns = {}
+        for name, dtype in schema:
+            column = np.frombuffer(buffer, dtype=dtype, count=count, offset=position)
+            columns[name] = column
+            position += column.nbytes
+
+        frames.append(DecodedFrame(
+            edge_id=edge_id,
+            schema_id=schema_id,
+            data_type=data_type,
+            base_time_us=base_time_us,
+            sample_count=count,
+            columns=columns,
+            raw=buffer[offset:frame_end]
+        ))
+        offset = frame_end
+
+    return frames
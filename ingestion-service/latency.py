@@ -0,0 +1,113 @@
+"""
+F1 Telemetry Ingestion Service - Edge-to-Cloud Latency
+Collection -> receipt -> durable latency histograms per edge and data type,
+corrected for edge clock skew estimated from heartbeats
+"""
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional, Tuple
+
+from prometheus_client import Gauge, Histogram
+
+# Edge devices may hold data back for minutes when the link is bad
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+collection_to_receipt_seconds = Histogram(
+    'telemetry_collection_to_receipt_seconds',
+    'Time from collection on the edge device to receipt by the service (skew corrected)',
+    ['edge_id', 'data_type'],
+    buckets=LATENCY_BUCKETS
+)
+
+receipt_to_durable_seconds = Histogram(
+    'telemetry_receipt_to_durable_seconds',
+    'Time from receipt by the service to the object being durable in S3',
+    ['edge_id', 'data_type'],
+    buckets=LATENCY_BUCKETS
+)
+
+end_to_end_seconds = Histogram(
+    'telemetry_end_to_end_seconds',
+    'Time from collection on the edge device to the object being durable in S3 (skew corrected)',
+    ['edge_id', 'data_type'],
+    buckets=LATENCY_BUCKETS
+)
+
+edge_clock_offset_seconds = Gauge(
+    'edge_clock_offset_seconds',
+    'Estimated offset of the service clock relative to the edge clock',
+    ['edge_id']
+)
+
+edge_heartbeat_rtt_seconds = Gauge(
+    'edge_heartbeat_rtt_seconds',
+    'Round-trip time of the heartbeat exchange used for the current offset estimate',
+    ['edge_id']
+)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an ISO 8601 timestamp (naive values are UTC)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class ClockSkewEstimator:
+    """
+    Per-edge clock offset from NTP-style heartbeat exchanges. Edges report the
+    offset and round-trip time of their previous exchange; the estimate is the
+    offset of the lowest-RTT sample in a sliding window, as that sample has
+    the least room for asymmetric network delay.
+    """
+
+    def __init__(self, window: int = 8):
+        self.window = window
+        self._samples: Dict[str, Deque[Tuple[float, float]]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, edge_id: str, offset: float, rtt: float):
+        if rtt < 0:
+            return
+        with self._lock:
+            samples = self._samples[edge_id]
+            samples.append((rtt, offset))
+            best_rtt, best_offset = min(samples)
+        edge_clock_offset_seconds.labels(edge_id=edge_id).set(best_offset)
+        edge_heartbeat_rtt_seconds.labels(edge_id=edge_id).set(best_rtt)
+
+    def offset(self, edge_id: str) -> float:
+        """Seconds to add to an edge timestamp to put it on the service clock (0 if unknown)"""
+        with self._lock:
+            samples = self._samples.get(edge_id)
+            return min(samples)[1] if samples else 0.0
+
+
+def observe_latency(
+    clocks: ClockSkewEstimator,
+    edge_id: str,
+    data_type: str,
+    collected_at: Optional[float],
+    received_at: float,
+    durable_at: float
+):
+    """Record the latency histograms for one stored message (all times epoch seconds)"""
+    receipt_to_durable_seconds.labels(edge_id=edge_id, data_type=data_type).observe(durable_at - received_at)
+    if collected_at is None:
+        return
+
+    collected_at += clocks.offset(edge_id)
+    # Residual skew can make a fresh message look like it came from the future
+    collection_to_receipt_seconds.labels(edge_id=edge_id, data_type=data_type).observe(
+        max(received_at - collected_at, 0.0)
+    )
+    end_to_end_seconds.labels(edge_id=edge_id, data_type=data_type).observe(
+        max(durable_at - collected_at, 0.0)
+    )
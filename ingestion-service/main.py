@@ -3,21 +3,30 @@ F1 Telemetry Ingestion Service
 FastAPI service for receiving and storing telemetry data
 """
 import os
+import time
+import gzip
+import asyncio
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Optional, List
 from contextlib import asynccontextmanager
 
-import boto3
-from botocore.exceptions import ClientError
+import requests
 from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from fastapi.responses import Response
 
+from latency import ClockSkewEstimator, observe_latency, parse_timestamp
+from models import TelemetryPayload
+from storage import S3Storage, TelemetryStorage, create_s3_client
+from segments import LocalSegmentStorage
+from sharding import FORWARDED_HEADER, OWNER_HEADER, ShardMap, shard_requests_total
+from frames import FRAME_CONTENT_TYPE, FrameFormatError, decode_frames
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -38,27 +47,32 @@ telemetry_processing_duration = Histogram(
     ['data_type']
 )
 
-s3_upload_duration = Histogram(
-    's3_upload_duration_seconds',
-    'Time spent uploading to S3',
-    ['bucket']
+telemetry_batch_size = Histogram(
+    'telemetry_batch_size',
+    'Number of telemetry messages per batch request',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128]
 )
 
+frame_decode_duration = Histogram(
+    'frame_decode_duration_seconds',
+    'Time spent decoding binary sample frame requests'
+)
 
-class TelemetryMetadata(BaseModel):
-    """Metadata for telemetry data"""
-    collection_time: str
-    source: str
-    version: str
-
+telemetry_samples_total = Counter(
+    'telemetry_samples_total',
+    'Total number of samples received in binary frames',
+    ['data_type']
+)
 
-class TelemetryPayload(BaseModel):
-    """Telemetry data payload"""
-    timestamp: str
+class Heartbeat(BaseModel):
+    """
+    Edge heartbeat. offset and rtt are the edge's measurement of its previous
+    heartbeat exchange (service clock minus edge clock, and round-trip time).
+    """
     edge_id: str
-    data_type: str
-    payload: Dict[str, Any]
-    metadata: TelemetryMetadata
+    sent_at: float
+    offset: Optional[float] = None
+    rtt: Optional[float] = None
 
 
 class HealthResponse(BaseModel):
@@ -68,94 +82,126 @@ class HealthResponse(BaseModel):
     version: str
 
 
-class S3Storage:
-    """Handles S3 storage operations (supports both AWS S3 and MinIO)"""
+def create_storage() -> TelemetryStorage:
+    """Storage backend from STORAGE_BACKEND: s3 (default) or local segments"""
+    bucket_name = os.environ.get("S3_BUCKET_NAME", "f1-telemetry-raw")
+    region = os.environ.get("AWS_REGION", "us-east-1")
+    backend = os.environ.get("STORAGE_BACKEND", "s3").lower()
+
+    if backend == "local":
+        s3_client = None
+        if os.environ.get("SEGMENT_SHIP_ENABLED", "true").lower() == "true":
+            try:
+                s3_client = create_s3_client(region)
+            except Exception as e:
+                logger.error(f"Failed to initialize S3 client, segments will not be shipped: {e}")
+        retention_mb = os.environ.get("SEGMENT_RETENTION_MB")
+        logger.info(f"Using local segment storage (shipping {'on' if s3_client else 'off'})")
+        return LocalSegmentStorage(
+            directory=os.environ.get("LOCAL_STORAGE_DIR", "/data/segments"),
+            max_segment_bytes=int(os.environ.get("SEGMENT_MAX_MB", "64")) * 1024 * 1024,
+            fsync_interval=float(os.environ.get("SEGMENT_FSYNC_INTERVAL", "1")),
+            s3_client=s3_client,
+            bucket_name=bucket_name,
+            # Pod names change on every restart; see persistent_node_id
+            node_id=os.environ.get("SEGMENT_NODE_ID") or os.environ.get("NODE_NAME"),
+            ship_interval=float(os.environ.get("SEGMENT_SHIP_INTERVAL", "30")),
+            seal_after=float(os.environ.get("SEGMENT_SEAL_AFTER", "300")),
+            retention_bytes=int(retention_mb) * 1024 * 1024 if retention_mb else None
+        )
+
+    return S3Storage(
+        bucket_name=bucket_name,
+        region=region,
+        manifest_enabled=os.environ.get("MANIFEST_ENABLED", "true").lower() == "true",
+        rollups_enabled=os.environ.get("ROLLUPS_ENABLED", "true").lower() == "true"
+    )
 
-    def __init__(self, bucket_name: str, region: str = "us-east-1"):
-        self.bucket_name = bucket_name
-        self.region = region
-        self.s3_client = None
 
-        try:
-            # Check if using MinIO (local development)
-            s3_endpoint = os.environ.get("S3_ENDPOINT_URL")
-            aws_access_key = os.environ.get("AWS_ACCESS_KEY_ID", "minioadmin")
-            aws_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY", "minioadmin")
-
-            if s3_endpoint:
-                # MinIO configuration
-                logger.info(f"Using S3-compatible storage at: {s3_endpoint}")
-                self.s3_client = boto3.client(
-                    's3',
-                    endpoint_url=s3_endpoint,
-                    aws_access_key_id=aws_access_key,
-                    aws_secret_access_key=aws_secret_key,
-                    region_name=region
-                )
-            else:
-                # AWS S3 configuration
-                self.s3_client = boto3.client('s3', region_name=region)
+def create_shard_map() -> Optional[ShardMap]:
+    """Edge affinity from SHARD_PEERS (static) and/or SHARD_DNS (headless Service); None when unset"""
+    peers = [peer.strip() for peer in os.environ.get("SHARD_PEERS", "").split(",") if peer.strip()]
+    dns_name = os.environ.get("SHARD_DNS")
+    if not peers and not dns_name:
+        return None
 
-            logger.info(f"Initialized S3 client for bucket: {bucket_name}")
-        except Exception as e:
-            logger.error(f"Failed to initialize S3 client: {e}")
+    port = int(os.environ.get("PORT", "8000"))
+    shard_map = ShardMap(
+        self_url=os.environ.get("SHARD_SELF", f"http://{os.environ.get('POD_IP', '127.0.0.1')}:{port}"),
+        peers=peers,
+        dns_name=dns_name,
+        port=port,
+        vnodes=int(os.environ.get("SHARD_VNODES", "64")),
+        refresh_interval=float(os.environ.get("SHARD_REFRESH_INTERVAL", "10")),
+        mode=os.environ.get("SHARD_MODE", "forward").lower()
+    )
+    logger.info(f"Edge affinity sharding as {shard_map.self_url} ({shard_map.mode} mode)")
+    return shard_map
 
-    def store_telemetry(self, telemetry: TelemetryPayload) -> Optional[str]:
-        """Store telemetry data in S3"""
-        if not self.s3_client:
-            logger.error("S3 client not initialized")
-            return None
 
-        try:
-            # Generate S3 key with partitioning
-            timestamp = datetime.fromisoformat(telemetry.timestamp.replace('Z', '+00:00'))
-            s3_key = (
-                f"raw-telemetry/"
-                f"year={timestamp.year}/"
-                f"month={timestamp.month:02d}/"
-                f"day={timestamp.day:02d}/"
-                f"data_type={telemetry.data_type}/"
-                f"{telemetry.edge_id}_{timestamp.isoformat()}.json"
-            )
+# Global storage instance
+storage: Optional[TelemetryStorage] = None
 
-            # Upload to S3
-            with s3_upload_duration.labels(bucket=self.bucket_name).time():
-                self.s3_client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=s3_key,
-                    Body=json.dumps(telemetry.model_dump(), indent=2),
-                    ContentType='application/json',
-                    Metadata={
-                        'edge_id': telemetry.edge_id,
-                        'data_type': telemetry.data_type,
-                        'collection_time': telemetry.metadata.collection_time
-                    }
-                )
+# Edge ownership across replicas (None: every replica accepts every edge)
+shard_map: Optional[ShardMap] = None
+
+# Per-edge clock offsets from heartbeats, used to correct latency measurements
+clocks = ClockSkewEstimator()
+
+
+def trace_ids(request: Request) -> List[str]:
+    """Trace IDs from the X-Trace-ID header (comma-separated, one per message or frame)"""
+    header = request.headers.get("X-Trace-ID", "")
+    return [trace_id.strip() for trace_id in header.split(",")] if header else []
+
+
+def observe_stored(telemetry: TelemetryPayload, received_at: float):
+    """Latency metrics for a JSON envelope that has just been stored"""
+    observe_latency(
+        clocks,
+        telemetry.edge_id,
+        telemetry.data_type,
+        collected_at=parse_timestamp(telemetry.metadata.collection_time),
+        received_at=received_at,
+        durable_at=time.time()
+    )
 
-            logger.info(f"Stored telemetry in S3: {s3_key}")
-            return s3_key
 
-        except ClientError as e:
-            logger.error(f"S3 upload error: {e}")
-            return None
+async def flush_periodically(name: str, buffer):
+    """
+    Flush a buffered writer (manifests, rollups, segments) on its schedule, or
+    early when its buffer fills and it sets flush_requested
+    """
+    while True:
+        await asyncio.to_thread(buffer.flush_requested.wait, buffer.flush_interval)
+        try:
+            await asyncio.to_thread(buffer.flush)
         except Exception as e:
-            logger.error(f"Unexpected error storing telemetry: {e}")
-            return None
+            logger.error(f"{name} flush failed: {e}")
 
 
-# Global storage instance
-storage: Optional[S3Storage] = None
+async def refresh_periodically(shard_map: ShardMap):
+    """Re-resolve shard ring membership as replicas scale"""
+    while True:
+        await asyncio.sleep(shard_map.refresh_interval)
+        await asyncio.to_thread(shard_map.refresh)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
-    global storage
+    global storage, shard_map
 
     # Startup
-    bucket_name = os.environ.get("S3_BUCKET_NAME", "f1-telemetry-raw")
-    region = os.environ.get("AWS_REGION", "us-east-1")
-    storage = S3Storage(bucket_name=bucket_name, region=region)
+    storage = create_storage()
+    flushers = storage.background_flushers()
+    flush_tasks = [
+        asyncio.create_task(flush_periodically(name, flusher))
+        for name, flusher in flushers
+    ]
+    shard_map = create_shard_map()
+    if shard_map and shard_map.dns_name:
+        flush_tasks.append(asyncio.create_task(refresh_periodically(shard_map)))
 
     logger.info("Ingestion service started")
 
@@ -163,6 +209,12 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Ingestion service shutting down")
+    for _name, flusher in flushers:
+        # Wake the waiting flush thread so shutdown is not held up by the interval
+        flusher.flush_requested.set()
+    for task in flush_tasks:
+        task.cancel()
+    storage.close()
 
 
 # Initialize FastAPI app
@@ -183,6 +235,55 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def route_to_shard_owner(request: Request, call_next):
+    """
+    Send per-edge ingest requests (X-Edge-ID) to the replica that owns the edge,
+    so its batches, rollups and clock estimates stay on one replica
+    """
+    edge_id = request.headers.get("X-Edge-ID")
+    if (not shard_map or not edge_id or request.method != "POST"
+            or not request.url.path.startswith("/api/v1/telemetry")):
+        return await call_next(request)
+
+    owner = shard_map.owner(edge_id)
+    if owner == shard_map.self_url:
+        shard_requests_total.labels(route="local").inc()
+        response = await call_next(request)
+    elif request.headers.get(FORWARDED_HEADER):
+        # The forwarding replica's ring differs from ours (a scale event is in
+        # progress); accept rather than bounce it around
+        shard_requests_total.labels(route="stale").inc()
+        response = await call_next(request)
+    elif shard_map.mode == "redirect":
+        shard_requests_total.labels(route="redirected").inc()
+        location = f"{owner}{request.url.path}"
+        if request.url.query:
+            location += f"?{request.url.query}"
+        response = RedirectResponse(location, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    else:
+        body = await request.body()
+        try:
+            forwarded = await asyncio.to_thread(
+                shard_map.forward, owner, request.url.path, request.url.query, request.headers, body
+            )
+        except requests.RequestException as e:
+            # Owner unreachable (restarting, or gone before the ring caught up)
+            logger.warning(f"Forward of {edge_id} to {owner} failed, handling locally: {e}")
+            shard_requests_total.labels(route="fallback").inc()
+            response = await call_next(request)
+        else:
+            shard_requests_total.labels(route="forwarded").inc()
+            response = Response(
+                content=forwarded.content,
+                status_code=forwarded.status_code,
+                media_type=forwarded.headers.get("Content-Type")
+            )
+
+    response.headers[OWNER_HEADER] = owner
+    return response
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
@@ -207,6 +308,10 @@ async def ingest_telemetry(telemetry: TelemetryPayload, request: Request):
     """
     Ingest telemetry data from edge devices
     """
+    received_at = time.time()
+    if not telemetry.metadata.trace_id:
+        telemetry.metadata.trace_id = next(iter(trace_ids(request)), None)
+
     with telemetry_processing_duration.labels(data_type=telemetry.data_type).time():
         try:
             # Validate edge ID from header
@@ -229,6 +334,7 @@ async def ingest_telemetry(telemetry: TelemetryPayload, request: Request):
                     detail="Failed to store telemetry"
                 )
 
+            observe_stored(telemetry, received_at)
             telemetry_requests_total.labels(
                 data_type=telemetry.data_type,
                 status="success"
@@ -237,6 +343,7 @@ async def ingest_telemetry(telemetry: TelemetryPayload, request: Request):
             return {
                 "status": "accepted",
                 "s3_key": s3_key,
+                "trace_id": telemetry.metadata.trace_id,
                 "timestamp": datetime.utcnow().isoformat()
             }
 
@@ -252,6 +359,185 @@ async def ingest_telemetry(telemetry: TelemetryPayload, request: Request):
             )
 
 
+@app.post("/api/v1/telemetry/batch", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_telemetry_batch(request: Request):
+    """
+    Ingest a batch of telemetry messages (JSON array, optionally gzip-encoded).
+    Edge devices coalesce messages into batches when the trackside link is degraded.
+    """
+    received_at = time.time()
+    body = await request.body()
+    try:
+        if request.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        items = json.loads(body)
+        if not isinstance(items, list):
+            raise ValueError("batch body must be a JSON array")
+        batch: List[TelemetryPayload] = [TelemetryPayload.model_validate(item) for item in items]
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors())
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid batch: {e}")
+
+    telemetry_batch_size.observe(len(batch))
+    for telemetry, trace_id in zip(batch, trace_ids(request)):
+        if not telemetry.metadata.trace_id:
+            telemetry.metadata.trace_id = trace_id
+
+    s3_keys = []
+    failed = 0
+    for telemetry in batch:
+        with telemetry_processing_duration.labels(data_type=telemetry.data_type).time():
+            s3_key = storage.store_telemetry(telemetry)
+        telemetry_requests_total.labels(
+            data_type=telemetry.data_type,
+            status="success" if s3_key else "failed"
+        ).inc()
+        if s3_key:
+            observe_stored(telemetry, received_at)
+            s3_keys.append(s3_key)
+        else:
+            failed += 1
+
+    if failed:
+        # Keys are derived from edge_id + timestamp, so a full resend is idempotent
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store {failed} of {len(batch)} telemetry messages"
+        )
+
+    return {
+        "status": "accepted",
+        "count": len(s3_keys),
+        "s3_keys": s3_keys,
+        "trace_ids": [telemetry.metadata.trace_id for telemetry in batch],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.post("/api/v1/telemetry/frames", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_frames(request: Request):
+    """
+    Ingest one or more concatenated binary sample frames
+    (Content-Type: application/vnd.f1-telemetry.frame.v1, optionally gzip-encoded).
+    X-Trace-ID carries one trace ID per frame, in order.
+    """
+    received_at = time.time()
+    content_type = request.headers.get("Content-Type", "").split(";")[0].strip()
+    if content_type != FRAME_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected Content-Type {FRAME_CONTENT_TYPE}"
+        )
+
+    body = await request.body()
+    try:
+        if request.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        with frame_decode_duration.time():
+            frames = decode_frames(body)
+    except (OSError, FrameFormatError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid frame: {e}")
+
+    edge_id_header = request.headers.get("X-Edge-ID")
+    frame_traces = trace_ids(request)
+    frame_traces += [None] * (len(frames) - len(frame_traces))
+    s3_keys = []
+    failed = 0
+    for frame, trace_id in zip(frames, frame_traces):
+        if edge_id_header and edge_id_header != frame.edge_id:
+            logger.warning(f"Edge ID mismatch: header={edge_id_header}, frame={frame.edge_id}")
+
+        with telemetry_processing_duration.labels(data_type=frame.data_type).time():
+            s3_key = storage.store_frame(frame, trace_id)
+        telemetry_requests_total.labels(
+            data_type=frame.data_type,
+            status="success" if s3_key else "failed"
+        ).inc()
+        if s3_key:
+            # Freshness of a frame is the age of its newest sample
+            observe_latency(
+                clocks,
+                frame.edge_id,
+                frame.data_type,
+                collected_at=frame.time_range_us[1] / 1_000_000,
+                received_at=received_at,
+                durable_at=time.time()
+            )
+            telemetry_samples_total.labels(data_type=frame.data_type).inc(frame.sample_count)
+            s3_keys.append(s3_key)
+        else:
+            failed += 1
+
+    if failed:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store {failed} of {len(frames)} frames"
+        )
+
+    return {
+        "status": "accepted",
+        "frames": len(s3_keys),
+        "samples": sum(frame.sample_count for frame in frames),
+        "s3_keys": s3_keys,
+        "trace_ids": frame_traces[:len(frames)],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.post("/api/v1/telemetry/heartbeat")
+async def heartbeat(beat: Heartbeat):
+    """
+    Edge heartbeat for clock skew estimation. The edge timestamps the request
+    (t0) and the response (t3); with received_at (t1) and responded_at (t2) it
+    computes offset = ((t1 - t0) + (t2 - t3)) / 2 and rtt = (t3 - t0) - (t2 - t1)
+    and reports them with its next heartbeat.
+    """
+    received_at = time.time()
+    if beat.offset is not None and beat.rtt is not None:
+        clocks.record(beat.edge_id, beat.offset, beat.rtt)
+
+    return {
+        "edge_id": beat.edge_id,
+        "received_at": received_at,
+        "offset_estimate": clocks.offset(beat.edge_id),
+        "responded_at": time.time()
+    }
+
+
+@app.get("/api/v1/rollups/current")
+async def current_rollups():
+    """
+    Rollups held in memory by this replica: per-minute traffic not yet flushed
+    and the latest per-stint lap time summaries. Flushed rollups are under
+    rollups/ in the bucket.
+    """
+    if not storage or not storage.rollups:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Rollups are disabled"
+        )
+    return storage.rollups.current()
+
+
+@app.get("/api/v1/shards")
+async def shards(edge_id: Optional[str] = None):
+    """This replica's view of the shard ring, and the owner of edge_id if given"""
+    if not shard_map:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sharding is disabled"
+        )
+    view = {
+        "self": shard_map.self_url,
+        "mode": shard_map.mode,
+        "replicas": sorted(shard_map.ring.members)
+    }
+    if edge_id:
+        view["owner"] = shard_map.owner(edge_id)
+    return view
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -261,7 +547,12 @@ async def root():
         "endpoints": {
             "health": "/health",
             "metrics": "/metrics",
-            "telemetry": "/api/v1/telemetry"
+            "telemetry": "/api/v1/telemetry",
+            "telemetry_batch": "/api/v1/telemetry/batch",
+            "telemetry_frames": "/api/v1/telemetry/frames",
+            "heartbeat": "/api/v1/telemetry/heartbeat",
+            "rollups": "/api/v1/rollups/current",
+            "shards": "/api/v1/shards"
         }
     }
 
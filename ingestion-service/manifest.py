@@ -0,0 +1,325 @@
+"""
+F1 Telemetry Ingestion Service - Partition Manifests
+Maintains a compact index of stored objects per partition, with record counts
+and time ranges that a listing does not give, so readers can plan a scan from
+one GET instead of listing the partition
+"""
+import json
+import random
+import time
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from botocore.exceptions import ClientError
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Writers append to shards under <partition>_manifest/<writer>/hour=HH.json,
+# which are compacted into <partition>_manifest.json
+MANIFEST_DIR = "_manifest/"
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 2
+MANIFEST_COLUMNS = ["key", "records", "bytes", "min_ts", "max_ts", "etag"]
+
+manifest_flush_duration = Histogram(
+    'manifest_flush_duration_seconds',
+    'Time spent flushing pending entries to partition manifests'
+)
+
+manifest_conflicts_total = Counter(
+    'manifest_conflicts_total',
+    'Manifest writes rejected because another replica updated the partition first'
+)
+
+manifest_entries_total = Counter(
+    'manifest_entries_total',
+    'Object entries merged into partition manifests',
+    ['status']
+)
+
+manifest_compactions_total = Counter(
+    'manifest_compactions_total',
+    'Partition manifest compactions',
+    ['status']
+)
+
+# Object entry: (records, bytes, min_ts, max_ts, etag), keyed by key relative to the partition
+Entry = Tuple[int, int, str, str, str]
+
+
+def partition_of(s3_key: str) -> Tuple[str, str]:
+    """Split an object key into (partition prefix, key relative to the partition)"""
+    partition, _, name = s3_key.rpartition("/")
+    return f"{partition}/", name
+
+
+def shard_key(partition: str, writer_id: str, timestamp: str) -> str:
+    """Manifest shard of a writer's objects in one hour of a partition (by ISO timestamp)"""
+    hour = timestamp[11:13]
+    if not hour.isdigit():
+        hour = "00"
+    return f"{partition}{MANIFEST_DIR}{writer_id}/hour={hour}.json"
+
+
+def conditional_update(
+    s3_client,
+    bucket_name: str,
+    key: str,
+    merge: Callable[[Optional[Any]], Any],
+    max_attempts: int = 8,
+    conflicts: Optional[Counter] = None,
+    loads: Callable[[bytes], Any] = json.loads,
+    dumps: Callable[[Any], str] = lambda document: json.dumps(document, separators=(",", ":")),
+    content_type: str = 'application/json'
+) -> bool:
+    """
+    Read-merge-write a document guarded by S3 conditional writes (If-Match on
+    the ETag read, If-None-Match: * when creating). On 412/409 another writer
+    got there first: back off, re-read and re-merge. merge receives the current
+    document (None if absent) and must be idempotent. Documents are JSON
+    unless loads/dumps say otherwise.
+    """
+    for attempt in range(max_attempts):
+        try:
+            try:
+                response = s3_client.get_object(Bucket=bucket_name, Key=key)
+                current, etag = loads(response["Body"].read()), response["ETag"]
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                    raise
+                current, etag = None, None
+
+            condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=dumps(merge(current)),
+                ContentType=content_type,
+                **condition
+            )
+            return True
+
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                if conflicts:
+                    conflicts.inc()
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+                continue
+            logger.error(f"Conditional update of {key} failed: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error updating {key}: {e}")
+            return False
+
+    logger.warning(f"Conditional update of {key} still conflicting after {max_attempts} attempts")
+    return False
+
+
+def merge_entries(manifest: Dict[str, Any], entries: Dict[str, Entry]) -> Dict[str, Any]:
+    """
+    Merge object entries into a manifest document. Entries are keyed by object
+    key, so merging is idempotent and order-independent: re-merging after a
+    conflict or a retried upload never double counts.
+    """
+    objects = rows_to_entries(manifest)
+    objects.update(entries)
+
+    rows = [[key, *entry] for key, entry in sorted(objects.items())]
+    min_ts = min((row[3] for row in rows), default=None)
+    max_ts = max((row[4] for row in rows), default=None)
+
+    merged = dict(manifest)
+    merged.update({
+        "version": MANIFEST_VERSION,
+        "generation": manifest.get("generation", 0) + 1,
+        "updated_at": datetime.utcnow().isoformat() + "Z",
+        "totals": {
+            "objects": len(rows),
+            "records": sum(row[1] for row in rows),
+            "bytes": sum(row[2] for row in rows),
+            "min_ts": min_ts,
+            "max_ts": max_ts,
+        },
+        "columns": MANIFEST_COLUMNS,
+        "objects": rows,
+    })
+    return merged
+
+
+def rows_to_entries(manifest: Dict[str, Any]) -> Dict[str, Entry]:
+    """Object entries of a manifest document, whatever columns it was written with"""
+    columns = manifest.get("columns", MANIFEST_COLUMNS)
+    entries = {}
+    for row in manifest.get("objects", []):
+        values = dict(zip(columns, row))
+        entries[values["key"]] = tuple(values.get(column, "") for column in MANIFEST_COLUMNS[1:])
+    return entries
+
+
+class ManifestWriter:
+    """
+    Buffers object entries in memory and periodically merges them into this
+    writer's manifest shard for each partition and hour, so a flush costs
+    O(objects in the touched shards) rather than O(objects in the partition).
+    Every compact_interval seconds (and on the final flush) each partition
+    written since its last compaction has all of its shards, from every
+    writer, folded into the partition manifest. The manifest records the ETag
+    of each shard it folded in, so a reader plans from that one document plus
+    only the shards written since.
+
+    All documents are written with conditional_update: concurrent writers
+    and compactions re-read and re-merge instead of overwriting. Entries are
+    keyed by object key, so merges are idempotent. Entries stay buffered until
+    their shard write succeeds, or are dropped (and counted) after
+    max_flush_attempts failed flushes, so an unreachable bucket cannot grow the
+    buffer without bound. A manifest never lists an object that was not
+    stored; objects whose entries were lost (buffered when the process was
+    killed, or dropped) are only found by listing the partition.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name: str,
+        writer_id: str,
+        flush_interval: float = 30.0,
+        max_pending: int = 5000,
+        max_attempts: int = 8,
+        compact_interval: float = 300.0,
+        max_flush_attempts: int = 10
+    ):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.writer_id = writer_id
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.compact_interval = compact_interval
+        self.max_flush_attempts = max_flush_attempts
+        self._pending: Dict[str, Dict[str, Entry]] = defaultdict(dict)
+        self._pending_count = 0
+        # Failed flushes per shard still buffered
+        self._failures: Dict[str, int] = defaultdict(int)
+        # Partitions with shard writes not yet compacted -> time of first such write
+        self._uncompacted: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.flush_requested = threading.Event()
+
+    def record(self, s3_key: str, records: int, nbytes: int, min_ts: str, max_ts: str, etag: str = ""):
+        """Buffer an entry for a stored object (cheap; no S3 calls)"""
+        partition, name = partition_of(s3_key)
+        shard = shard_key(partition, self.writer_id, min_ts)
+        with self._lock:
+            if name not in self._pending[shard]:
+                self._pending_count += 1
+            self._pending[shard][name] = (records, nbytes, min_ts, max_ts, etag.strip('"'))
+            if self._pending_count >= self.max_pending:
+                self.flush_requested.set()
+
+    def flush(self, final: bool = False) -> int:
+        """
+        Merge all buffered entries into their manifest shards, then compact the
+        partitions that are due (all of them with final); returns entries written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(dict)
+                self._pending_count = 0
+                self.flush_requested.clear()
+
+            written = 0
+            with manifest_flush_duration.time():
+                for shard, entries in pending.items():
+                    if self._update_shard(shard, entries):
+                        written += len(entries)
+                        self._failures.pop(shard, None)
+                        self._uncompacted.setdefault(shard[:shard.index(MANIFEST_DIR)], time.monotonic())
+                        manifest_entries_total.labels(status="written").inc(len(entries))
+                    else:
+                        self._requeue(shard, entries)
+
+                now = time.monotonic()
+                for partition, since in list(self._uncompacted.items()):
+                    if final or now - since >= self.compact_interval:
+                        if self.compact(partition):
+                            del self._uncompacted[partition]
+
+            if pending:
+                logger.info(f"Flushed {written} manifest entries across {len(pending)} shards")
+            return written
+
+    def _requeue(self, shard: str, entries: Dict[str, Entry]):
+        self._failures[shard] += 1
+        if self._failures[shard] >= self.max_flush_attempts:
+            del self._failures[shard]
+            manifest_entries_total.labels(status="dropped").inc(len(entries))
+            logger.error(f"Dropping {len(entries)} manifest entries for {shard} after {self.max_flush_attempts} failed flushes")
+            return
+
+        manifest_entries_total.labels(status="retried").inc(len(entries))
+        with self._lock:
+            current = self._pending[shard]
+            for name, entry in entries.items():
+                if name not in current:
+                    current[name] = entry
+                    self._pending_count += 1
+
+    def _update_shard(self, shard: str, entries: Dict[str, Entry]) -> bool:
+        partition = shard[:shard.index(MANIFEST_DIR)]
+        return conditional_update(
+            self.s3_client,
+            self.bucket_name,
+            shard,
+            lambda current: merge_entries(current or {"partition": partition, "writer": self.writer_id}, entries),
+            max_attempts=self.max_attempts,
+            conflicts=manifest_conflicts_total
+        )
+
+    def compact(self, partition: str) -> bool:
+        """Fold every shard of a partition changed since the last compaction into its manifest"""
+        try:
+            shards = {}
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{partition}{MANIFEST_DIR}"):
+                shards.update((obj["Key"], obj["ETag"].strip('"')) for obj in page.get("Contents", []))
+        except ClientError as e:
+            manifest_compactions_total.labels(status="failed").inc()
+            logger.error(f"Listing manifest shards of {partition} failed: {e}")
+            return False
+
+        # Shard contents, read at most once across conflict retries. A shard read
+        # after it was listed is at least as new as its listed ETag, so the ETags
+        # recorded never claim more than was folded in.
+        contents: Dict[str, Dict[str, Entry]] = {}
+
+        def fold(current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            current = current or {"partition": partition}
+            folded = current.get("shards", {})
+            entries: Dict[str, Entry] = {}
+            for key, etag in sorted(shards.items()):
+                if folded.get(key) == etag:
+                    continue
+                if key not in contents:
+                    response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+                    contents[key] = rows_to_entries(json.loads(response["Body"].read()))
+                entries.update(contents[key])
+            manifest = merge_entries(current, entries)
+            manifest["shards"] = {**folded, **shards}
+            return manifest
+
+        ok = conditional_update(
+            self.s3_client,
+            self.bucket_name,
+            f"{partition}{MANIFEST_NAME}",
+            fold,
+            max_attempts=self.max_attempts,
+            conflicts=manifest_conflicts_total
+        )
+        manifest_compactions_total.labels(status="compacted" if ok else "failed").inc()
+        return ok
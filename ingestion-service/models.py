@@ -0,0 +1,24 @@
+"""
+F1 Telemetry Ingestion Service - Telemetry Models
+Envelope schema shared by the API, the storage backends and the backfill tool
+"""
+from typing import Dict, Any, Optional
+
+from pydantic import BaseModel
+
+
+class TelemetryMetadata(BaseModel):
+    """Metadata for telemetry data"""
+    collection_time: str
+    source: str
+    version: str
+    trace_id: Optional[str] = None
+
+
+class TelemetryPayload(BaseModel):
+    """Telemetry data payload"""
+    timestamp: str
+    edge_id: str
+    data_type: str
+    payload: Dict[str, Any]
+    metadata: TelemetryMetadata
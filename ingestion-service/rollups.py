@@ -0,0 +1,373 @@
+"""
+F1 Telemetry Ingestion Service - Streaming Rollups
+Incremental per-minute traffic counts and per-stint lap time summaries,
+maintained as data arrives and flushed to S3 as compact JSON Lines objects
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple
+
+from botocore.exceptions import ClientError
+from prometheus_client import Counter, Gauge, Histogram
+
+from manifest import conditional_update
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PREFIX = "rollups/"
+
+rollup_flush_duration = Histogram(
+    'rollup_flush_duration_seconds',
+    'Time spent flushing rollups to S3'
+)
+
+rollup_open_windows = Gauge(
+    'rollup_open_windows',
+    'Per-minute traffic rollup rows held in memory'
+)
+
+rollup_dropped_total = Counter(
+    'rollup_dropped_total',
+    'Rollup rows dropped because the in-memory aggregator was full'
+)
+
+rollup_races_dropped_total = Counter(
+    'rollup_races_dropped_total',
+    'Race lap states dropped after repeatedly failing to be written'
+)
+
+# (minute, edge_id, data_type) -> [messages, bytes, samples]
+TrafficKey = Tuple[str, str, str]
+
+
+def _minute(timestamp: datetime) -> str:
+    return timestamp.strftime("%Y-%m-%dT%H:%M")
+
+
+def _lap_seconds(value: str) -> float:
+    """'1:33.234' -> 93.234"""
+    minutes, _, seconds = value.rpartition(":")
+    return (int(minutes) * 60 if minutes else 0) + float(seconds)
+
+
+def _race(payload: Dict[str, Any]) -> Tuple[Optional[Tuple[str, str]], Optional[Dict[str, Any]]]:
+    """((season, round), first race) of an Ergast RaceTable payload"""
+    try:
+        table = payload["MRData"]["RaceTable"]
+        races = table["Races"]
+    except (KeyError, TypeError):
+        return None, None
+    if not races:
+        return None, None
+    race = races[0]
+    season = race.get("season", table.get("season", "unknown"))
+    round_ = race.get("round", table.get("round", "unknown"))
+    return (str(season), str(round_)), race
+
+
+class RaceLaps:
+    """Lap times and pit laps seen for one race, deduplicated by (driver, lap)"""
+
+    def __init__(self):
+        self.laps: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.pit_laps: Dict[str, set] = defaultdict(set)
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable copy of the laps and pit laps"""
+        return {
+            "laps": {driver: {str(lap): seconds for lap, seconds in laps.items()} for driver, laps in self.laps.items()},
+            "pit_laps": {driver: sorted(pits) for driver, pits in self.pit_laps.items()},
+        }
+
+    def merge(self, state: Dict[str, Any]):
+        """Union with a state() document; keyed by (driver, lap), so idempotent"""
+        for driver, laps in state.get("laps", {}).items():
+            self.laps[driver].update((int(lap), seconds) for lap, seconds in laps.items())
+        for driver, pits in state.get("pit_laps", {}).items():
+            self.pit_laps[driver].update(pits)
+
+    def stints(self) -> List[Dict[str, Any]]:
+        """min/max/mean lap time per driver per stint (a stint ends on a pit lap)"""
+        rows = []
+        for driver, laps in sorted(self.laps.items()):
+            pits = sorted(self.pit_laps.get(driver, ()))
+            by_stint: Dict[int, List[float]] = defaultdict(list)
+            for lap, seconds in laps.items():
+                stint = 1 + sum(1 for pit in pits if pit < lap)
+                by_stint[stint].append(seconds)
+            for stint, times in sorted(by_stint.items()):
+                rows.append({
+                    "driver_id": driver,
+                    "stint": stint,
+                    "laps": len(times),
+                    "min_lap_s": round(min(times), 3),
+                    "max_lap_s": round(max(times), 3),
+                    "mean_lap_s": round(sum(times) / len(times), 3),
+                })
+        return rows
+
+
+class RollupAggregator:
+    """
+    Bounded in-memory aggregator for ingest-time rollups.
+
+    Traffic rows are keyed by minute and flushed once the minute has closed
+    (plus one minute of grace for late arrivals); each replica writes its own
+    objects, so readers sum rows across writers. Lap times are kept per race as
+    a (driver, lap) map, so repeated replays of the same lap document are not
+    double counted. Replicas merge their maps into one shared state document
+    per race with conditional writes and regenerate the race's single lap
+    summary object from the merged state. A race whose write fails on
+    max_write_attempts consecutive flushes is dropped and counted, so a store
+    that keeps rejecting writes cannot grow the unwritten laps without bound.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name: str,
+        writer_id: str,
+        flush_interval: float = 60.0,
+        max_windows: int = 20000,
+        max_races: int = 4,
+        max_write_attempts: int = 10
+    ):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.writer_id = writer_id
+        self.flush_interval = flush_interval
+        self.max_windows = max_windows
+        self.max_races = max_races
+        self.max_write_attempts = max_write_attempts
+        self._traffic: Dict[TrafficKey, List[int]] = {}
+        self._races: "OrderedDict[Tuple[str, str], RaceLaps]" = OrderedDict()
+        self._dirty_races: set = set()
+        # Laps not yet written for races evicted from _races, or whose write failed
+        self._unwritten: Dict[Tuple[str, str], RaceLaps] = {}
+        # Consecutive failed writes per race
+        self._write_failures: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.flush_requested = threading.Event()
+
+    def observe(
+        self,
+        timestamp: datetime,
+        edge_id: str,
+        data_type: str,
+        nbytes: int,
+        samples: int = 1,
+        payload: Optional[Dict[str, Any]] = None
+    ):
+        """Fold one stored message into the rollups"""
+        key = (_minute(timestamp), edge_id, data_type)
+        with self._lock:
+            if payload and data_type in ("lap_times", "pit_stops"):
+                self._observe_race(data_type, payload)
+
+            row = self._traffic.get(key)
+            if row is None:
+                if len(self._traffic) >= self.max_windows:
+                    rollup_dropped_total.inc()
+                    self.flush_requested.set()
+                    return
+                row = self._traffic[key] = [0, 0, 0]
+            row[0] += 1
+            row[1] += nbytes
+            row[2] += samples
+            rollup_open_windows.set(len(self._traffic))
+
+    def _observe_race(self, data_type: str, payload: Dict[str, Any]):
+        race_key, race = _race(payload)
+        if race is None:
+            return
+        laps = self._races.get(race_key)
+        if laps is None:
+            laps = self._races[race_key] = RaceLaps()
+            while len(self._races) > self.max_races:
+                evicted_key, evicted = self._races.popitem(last=False)
+                if evicted_key in self._dirty_races:
+                    # e.g. a backfill of many races: keep the laps until they are written
+                    self._dirty_races.discard(evicted_key)
+                    self._unwritten.setdefault(evicted_key, RaceLaps()).merge(evicted.state())
+                    self.flush_requested.set()
+        self._races.move_to_end(race_key)
+        self._dirty_races.add(race_key)
+
+        try:
+            if data_type == "lap_times":
+                for lap in race.get("Laps", []):
+                    number = int(lap["number"])
+                    for timing in lap.get("Timings", []):
+                        laps.laps[timing["driverId"]][number] = _lap_seconds(timing["time"])
+            else:
+                for stop in race.get("PitStops", []):
+                    laps.pit_laps[stop["driverId"]].add(int(stop["lap"]))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping malformed {data_type} payload in rollups: {e}")
+
+    def current(self) -> Dict[str, Any]:
+        """The in-memory (not yet flushed) window, for the HTTP endpoint"""
+        with self._lock:
+            traffic = [
+                {"minute": minute, "edge_id": edge_id, "data_type": data_type,
+                 "messages": row[0], "bytes": row[1], "samples": row[2]}
+                for (minute, edge_id, data_type), row in sorted(self._traffic.items())
+            ]
+            lap_stats = {
+                f"{season}/{round_}": laps.stints()
+                for (season, round_), laps in self._races.items()
+            }
+        return {"writer_id": self.writer_id, "traffic": traffic, "lap_stats": lap_stats}
+
+    def flush(self, final: bool = False) -> int:
+        """
+        Write closed traffic minutes and changed lap summaries to S3. With final,
+        every open minute is flushed (shutdown). Returns traffic rows written.
+        """
+        with self._flush_lock:
+            now = datetime.now(timezone.utc)
+            with self._lock:
+                closed = {
+                    key: row for key, row in self._traffic.items()
+                    if final or self._closed(key[0], now)
+                }
+                for key in closed:
+                    del self._traffic[key]
+                rollup_open_windows.set(len(self._traffic))
+                self.flush_requested.clear()
+                unwritten, self._unwritten = self._unwritten, {}
+                for key in self._dirty_races:
+                    if key in self._races:
+                        unwritten.setdefault(key, RaceLaps()).merge(self._races[key].state())
+                self._dirty_races.clear()
+                races = {key: laps.state() for key, laps in unwritten.items()}
+
+            with rollup_flush_duration.time():
+                written = self._write_traffic(closed, now)
+                self._write_lap_stats(races)
+            if written:
+                logger.info(f"Flushed {written} traffic rollup rows and {len(races)} lap summaries")
+            return written
+
+    @staticmethod
+    def _closed(minute: str, now: datetime) -> bool:
+        start = datetime.strptime(minute, "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc)
+        return (now - start).total_seconds() >= 120
+
+    def _write_traffic(self, rows: Dict[TrafficKey, List[int]], now: datetime) -> int:
+        if not rows:
+            return 0
+
+        # One object per (day, hour) touched, per writer, per flush
+        by_hour: Dict[str, List[str]] = defaultdict(list)
+        for (minute, edge_id, data_type), (messages, nbytes, samples) in sorted(rows.items()):
+            by_hour[minute[:13]].append(json.dumps({
+                "minute": minute, "edge_id": edge_id, "data_type": data_type,
+                "messages": messages, "bytes": nbytes, "samples": samples,
+            }, separators=(",", ":")))
+
+        # The sequence keeps two flushes within the same second from colliding
+        self._sequence += 1
+        written = 0
+        for hour, lines in by_hour.items():
+            key = (
+                f"{ROLLUP_PREFIX}traffic/"
+                f"year={hour[0:4]}/month={hour[5:7]}/day={hour[8:10]}/hour={hour[11:13]}/"
+                f"{self.writer_id}_{now.strftime('%Y%m%dT%H%M%S')}_{self._sequence:06d}.jsonl"
+            )
+            if self._put(key, "\n".join(lines) + "\n"):
+                written += len(lines)
+            else:
+                self._restore(rows, hour)
+        return written
+
+    def _restore(self, rows: Dict[TrafficKey, List[int]], hour: str):
+        """Merge rows of a failed write back into memory for the next flush"""
+        with self._lock:
+            for key, (messages, nbytes, samples) in rows.items():
+                if key[0][:13] != hour:
+                    continue
+                row = self._traffic.setdefault(key, [0, 0, 0])
+                row[0] += messages
+                row[1] += nbytes
+                row[2] += samples
+
+    def _write_lap_stats(self, races: Dict[Tuple[str, str], Dict[str, Any]]):
+        for (season, round_), state in races.items():
+            key = (season, round_)
+            if self._write_race(season, round_, state):
+                self._write_failures.pop(key, None)
+                continue
+
+            self._write_failures[key] += 1
+            if self._write_failures[key] >= self.max_write_attempts:
+                del self._write_failures[key]
+                rollup_races_dropped_total.inc()
+                logger.error(f"Dropping lap stats of {season}/{round_} after {self.max_write_attempts} failed writes")
+                continue
+            with self._lock:
+                self._unwritten.setdefault(key, RaceLaps()).merge(state)
+
+    def _write_race(self, season: str, round_: str, state: Dict[str, Any]) -> bool:
+        """
+        Merge this replica's laps into the race's shared state, then rewrite the
+        race's lap summary from the merged state unless a later generation has
+        already been written
+        """
+        partition = f"season={season}/round={round_}/"
+        merged = RaceLaps()
+        generation = 0
+
+        def merge_state(current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            nonlocal merged, generation
+            merged = RaceLaps()
+            merged.merge(current or {})
+            merged.merge(state)
+            generation = (current or {}).get("generation", 0) + 1
+            return {"generation": generation, **merged.state()}
+
+        if not conditional_update(
+            self.s3_client, self.bucket_name, f"{ROLLUP_PREFIX}lap_state/{partition}laps.json", merge_state
+        ):
+            return False
+
+        lines = [
+            json.dumps({**stint, "generation": generation}, separators=(",", ":"))
+            for stint in merged.stints()
+        ]
+
+        def newest(current: Optional[str]) -> str:
+            first = (current or "").split("\n", 1)[0]
+            if first and json.loads(first).get("generation", 0) > generation:
+                return current
+            return "\n".join(lines) + "\n"
+
+        return conditional_update(
+            self.s3_client,
+            self.bucket_name,
+            f"{ROLLUP_PREFIX}lap_stats/{partition}lap_stats.jsonl",
+            newest,
+            loads=lambda body: body.decode("utf-8"),
+            dumps=str,
+            content_type='application/x-ndjson'
+        )
+
+    def _put(self, key: str, body: str) -> bool:
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=body,
+                ContentType='application/x-ndjson'
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Rollup upload error for {key}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error writing rollup {key}: {e}")
+        return False
@@ -0,0 +1,616 @@
+"""
+F1 Telemetry Ingestion Service - Segmented Local Storage
+Append-only, size-rotated segment files with a compact offset index, read
+through memory maps and shipped to S3 once sealed. Intended for Raspberry Pi
+and other edge deployments where running MinIO just to store bytes is too
+expensive.
+
+Usage (inspect or export a segment directory):
+    python segments.py /data/segments --from-offset 0 --limit 20
+    python segments.py /data/segments --export /tmp/raw
+"""
+import os
+import json
+import mmap
+import time
+import zlib
+import socket
+import struct
+import bisect
+import logging
+import argparse
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple, Any
+
+from botocore.exceptions import ClientError
+from prometheus_client import Counter, Gauge, Histogram
+
+from frames import DecodedFrame
+from storage import TelemetryStorage
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+SHIPPED_SUFFIX = ".shipped"
+# Name under segments/ in the bucket, kept with the data so it survives restarts
+NODE_ID_FILE = "node_id"
+
+# body length, crc32 of kind + key + body, kind, key length; then key, then body
+RECORD_HEADER = struct.Struct("<IIBH")
+# Byte position of each record within its segment, one entry per record
+INDEX_ENTRY = struct.Struct("<I")
+# Every record must start at a position an index entry can hold
+MAX_SEGMENT_BYTES = 1 << (8 * INDEX_ENTRY.size)
+
+KIND_JSON = 1
+KIND_FRAME = 2
+KIND_EXTENSIONS = {KIND_JSON: "json", KIND_FRAME: "f1tf"}
+
+segment_append_duration = Histogram(
+    'segment_append_duration_seconds',
+    'Time spent appending a record to the local segment log'
+)
+
+segment_unshipped_bytes = Gauge(
+    'segment_unshipped_bytes',
+    'Bytes in local segments not yet shipped to S3'
+)
+
+segments_shipped_total = Counter(
+    'segments_shipped_total',
+    'Sealed segments shipped to S3',
+    ['status']
+)
+
+
+@dataclass
+class Record:
+    """One record read from the log; body is a view into the segment mapping"""
+    offset: int
+    kind: int
+    key: str
+    body: memoryview
+
+
+def _segment_name(base_offset: int, suffix: str) -> str:
+    return f"{base_offset:020d}{suffix}"
+
+
+class _MappedFile:
+    """
+    Read-only mmap of a file that may still be growing; remapped on demand.
+    Views handed out keep pointing into the mapping they came from, so a
+    replaced mapping is only closed once no view of it is left.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map: Optional[mmap.mmap] = None
+        self._retired: List[mmap.mmap] = []
+
+    def view(self, position: int, length: int) -> memoryview:
+        end = position + length
+        if self._map is None or end > len(self._map):
+            size = os.fstat(self._file.fileno()).st_size
+            if end > size:
+                raise ValueError(f"Read past end of {self.path}")
+            if self._map is not None:
+                self._retired.append(self._map)
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+            self._release_retired()
+        return memoryview(self._map)[position:end]
+
+    def _release_retired(self):
+        still_viewed = []
+        for retired in self._retired:
+            try:
+                retired.close()
+            except BufferError:
+                # A caller still holds a view; try again on the next remap
+                still_viewed.append(retired)
+        self._retired = still_viewed
+
+    def close(self):
+        if self._map is not None:
+            self._retired.append(self._map)
+            self._map = None
+        # Mappings still viewed are released with their last view
+        self._release_retired()
+        self._retired.clear()
+        self._file.close()
+
+
+class Segment:
+    """One segment: a log file of records and its dense position index"""
+
+    def __init__(self, directory: str, base_offset: int):
+        self.base_offset = base_offset
+        self.log_path = os.path.join(directory, _segment_name(base_offset, SEGMENT_SUFFIX))
+        self.index_path = os.path.join(directory, _segment_name(base_offset, INDEX_SUFFIX))
+        self.shipped_path = os.path.join(directory, _segment_name(base_offset, SHIPPED_SUFFIX))
+        self.size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        self.count = os.path.getsize(self.index_path) // INDEX_ENTRY.size if os.path.exists(self.index_path) else 0
+        self.created = time.time()
+        # Set while this is the active segment
+        self._log_fd: Optional[int] = None
+        self._positions: Optional[array] = None
+        self._pending_index = bytearray()
+
+    @property
+    def next_offset(self) -> int:
+        return self.base_offset + self.count
+
+    @property
+    def shipped(self) -> bool:
+        return os.path.exists(self.shipped_path)
+
+    def open_for_append(self):
+        """Recover the tail and make this the active segment"""
+        self._positions = self._recover()
+        self.count = len(self._positions)
+        self._log_fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _recover(self) -> array:
+        """
+        Rebuild the index of the active segment from its log, dropping a torn
+        or corrupt tail left by a crash. Sealed segments were fsynced when
+        sealed and are trusted as-is.
+        """
+        positions = array("I")
+        if not self.size:
+            open(self.index_path, "wb").close()
+            return positions
+
+        # Scan through a read-only map so only one record at a time is copied
+        position = 0
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            while position + RECORD_HEADER.size <= self.size:
+                body_len, crc, kind, key_len = RECORD_HEADER.unpack_from(data, position)
+                end = position + RECORD_HEADER.size + key_len + body_len
+                if end > self.size or zlib.crc32(data[position + 8:end]) != crc:
+                    break
+                positions.append(position)
+                position = end
+
+        if position != self.size:
+            logger.warning(f"Truncating {self.size - position} bytes of torn tail from {self.log_path}")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(position)
+            self.size = position
+
+        with open(self.index_path, "wb") as f:
+            f.write(positions.tobytes())
+        return positions
+
+    def append(self, record: bytes) -> int:
+        """Append an encoded record; returns its offset"""
+        position = self.size
+        pending = memoryview(record)
+        while pending:
+            pending = pending[os.write(self._log_fd, pending):]
+        self.size += len(record)
+        self._positions.append(position)
+        self._pending_index += INDEX_ENTRY.pack(position)
+        self.count += 1
+        return self.base_offset + self.count - 1
+
+    def sync(self):
+        """Write buffered index entries and fsync both files"""
+        if self._log_fd is None:
+            return
+        os.fsync(self._log_fd)
+        if self._pending_index:
+            with open(self.index_path, "ab") as f:
+                f.write(self._pending_index)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending_index.clear()
+
+    def seal(self):
+        """Make durable and stop accepting appends"""
+        self.sync()
+        os.close(self._log_fd)
+        self._log_fd = None
+        self._positions = None
+
+    def position(self, index: int, index_map: Optional["_MappedFile"]) -> int:
+        if self._positions is not None:
+            return self._positions[index]
+        return INDEX_ENTRY.unpack(index_map.view(index * INDEX_ENTRY.size, INDEX_ENTRY.size))[0]
+
+
+class SegmentLog:
+    """
+    Append-only log of records split into size-rotated segments. Offsets are
+    global and dense: a segment's file name is the offset of its first record
+    and its index holds one 4-byte position per record, so a lookup is a
+    bisect over segments and one index read. Only the active segment is ever
+    written; every older segment is sealed.
+
+    Appends are written straight to the OS (visible to readers at once) and
+    fsynced by flush() every fsync_interval seconds (group commit), which the
+    service runs in the background, so the durability window is bounded
+    without an fsync per record on an SD card or in the request path. With
+    fsync_interval 0 every append is fsynced before it returns.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+        max_open_maps: int = 16
+    ):
+        if not 0 < max_segment_bytes <= MAX_SEGMENT_BYTES:
+            raise ValueError(
+                f"max_segment_bytes must be between 1 and {MAX_SEGMENT_BYTES} (4-byte index positions), "
+                f"got {max_segment_bytes}"
+            )
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_interval = fsync_interval
+        self.max_open_maps = max_open_maps
+        os.makedirs(directory, exist_ok=True)
+
+        # Flusher protocol (see TelemetryStorage.background_flushers)
+        self.flush_interval = fsync_interval
+        self.flush_requested = threading.Event()
+
+        self._lock = threading.RLock()
+        self._maps: "OrderedDict[str, _MappedFile]" = OrderedDict()
+
+        bases = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        self.segments: List[Segment] = [Segment(directory, base) for base in bases] or [Segment(directory, 0)]
+        self.active.open_for_append()
+        logger.info(
+            f"Opened segment log at {directory}: {len(self.segments)} segments, next offset {self.next_offset}"
+        )
+
+    @property
+    def active(self) -> Segment:
+        return self.segments[-1]
+
+    @property
+    def next_offset(self) -> int:
+        return self.active.next_offset
+
+    def append(self, kind: int, key: str, body: bytes) -> int:
+        """Append one record; returns its offset"""
+        key_bytes = key.encode("utf-8")
+        prefix = struct.pack("<BH", kind, len(key_bytes)) + key_bytes
+        crc = zlib.crc32(body, zlib.crc32(prefix))
+        record = b"".join((struct.pack("<II", len(body), crc), prefix, body))
+
+        with segment_append_duration.time(), self._lock:
+            if self.active.size and self.active.size + len(record) > self.max_segment_bytes:
+                self._roll()
+            offset = self.active.append(record)
+            if not self.fsync_interval:
+                self.active.sync()
+        return offset
+
+    def sync(self):
+        with self._lock:
+            self.active.sync()
+
+    def flush(self):
+        """Group commit: fsync everything appended since the last flush"""
+        self.flush_requested.clear()
+        self.sync()
+
+    def roll(self, max_age: Optional[float] = None) -> bool:
+        """Seal the active segment if it has records (and is older than max_age)"""
+        with self._lock:
+            active = self.active
+            if not active.count or (max_age is not None and time.time() - active.created < max_age):
+                return False
+            self._roll()
+            return True
+
+    def _roll(self):
+        sealed = self.active
+        sealed.seal()
+        segment = Segment(self.directory, sealed.next_offset)
+        segment.open_for_append()
+        self.segments.append(segment)
+        logger.info(f"Sealed segment {sealed.base_offset} ({sealed.count} records, {sealed.size} bytes)")
+
+    def sealed_segments(self) -> List[Segment]:
+        with self._lock:
+            return self.segments[:-1]
+
+    def remove(self, segment: Segment):
+        """Delete a sealed segment (retention)"""
+        with self._lock:
+            self.segments.remove(segment)
+            for path in (segment.log_path, segment.index_path):
+                mapped = self._maps.pop(path, None)
+                if mapped:
+                    mapped.close()
+            for path in (segment.log_path, segment.index_path, segment.shipped_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _map(self, path: str) -> _MappedFile:
+        mapped = self._maps.get(path)
+        if mapped is None:
+            mapped = self._maps[path] = _MappedFile(path)
+            while len(self._maps) > self.max_open_maps:
+                _, evicted = self._maps.popitem(last=False)
+                evicted.close()
+        self._maps.move_to_end(path)
+        return mapped
+
+    def read(self, offset: int) -> Record:
+        """Read one record by offset through the segment's memory map"""
+        with self._lock:
+            bases = [segment.base_offset for segment in self.segments]
+            segment = self.segments[max(bisect.bisect_right(bases, offset) - 1, 0)]
+            if not segment.base_offset <= offset < segment.next_offset:
+                raise KeyError(f"Offset {offset} is not in the log")
+
+            index = offset - segment.base_offset
+            index_map = self._map(segment.index_path) if segment._positions is None else None
+            position = segment.position(index, index_map)
+
+            log_map = self._map(segment.log_path)
+            body_len, _crc, kind, key_len = RECORD_HEADER.unpack(log_map.view(position, RECORD_HEADER.size))
+            start = position + RECORD_HEADER.size
+            key = bytes(log_map.view(start, key_len)).decode("utf-8")
+            body = log_map.view(start + key_len, body_len)
+        return Record(offset=offset, kind=kind, key=key, body=body)
+
+    def scan(self, start: int = 0) -> Iterator[Record]:
+        """Iterate records from an offset to the current end of the log"""
+        first = self.segments[0].base_offset
+        for offset in range(max(start, first), self.next_offset):
+            yield self.read(offset)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(segment.size for segment in self.segments)
+
+    def unshipped_bytes(self) -> int:
+        with self._lock:
+            return sum(segment.size for segment in self.segments if not segment.shipped)
+
+    def close(self):
+        with self._lock:
+            self.active.sync()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+class SegmentShipper:
+    """
+    Periodic maintenance of a segment log: fsync, seal the active segment once
+    it is older than seal_after (so low-rate data still ships), upload sealed
+    segments to S3 and apply retention to segments that have been shipped.
+
+    Segments are uploaded oldest first and each is marked shipped only after
+    both objects are stored, so when the link is down shipping simply resumes
+    on a later run. Unshipped segments are never deleted.
+    """
+
+    def __init__(
+        self,
+        log: SegmentLog,
+        s3_client=None,
+        bucket_name: Optional[str] = None,
+        node_id: str = "edge",
+        flush_interval: float = 30.0,
+        seal_after: float = 300.0,
+        retention_bytes: Optional[int] = None
+    ):
+        self.log = log
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.node_id = node_id
+        self.flush_interval = flush_interval
+        self.seal_after = seal_after
+        self.retention_bytes = retention_bytes
+        self._flush_lock = threading.Lock()
+        self.flush_requested = threading.Event()
+
+    def flush(self) -> int:
+        """One maintenance pass; returns the number of segments shipped"""
+        with self._flush_lock:
+            self.flush_requested.clear()
+            self.log.sync()
+            self.log.roll(max_age=self.seal_after)
+
+            shipped = 0
+            if self.s3_client:
+                for segment in self.log.sealed_segments():
+                    if segment.shipped:
+                        continue
+                    if not self._ship(segment):
+                        break
+                    shipped += 1
+
+            self._apply_retention()
+            segment_unshipped_bytes.set(self.log.unshipped_bytes())
+            if shipped:
+                logger.info(f"Shipped {shipped} sealed segments to s3://{self.bucket_name}/segments/{self.node_id}/")
+            return shipped
+
+    def _ship(self, segment: Segment) -> bool:
+        prefix = f"segments/{self.node_id}/"
+        metadata = {
+            'node_id': self.node_id,
+            'first_offset': str(segment.base_offset),
+            'records': str(segment.count)
+        }
+        try:
+            for path in (segment.index_path, segment.log_path):
+                self.s3_client.upload_file(
+                    path,
+                    self.bucket_name,
+                    prefix + os.path.basename(path),
+                    ExtraArgs={'ContentType': 'application/octet-stream', 'Metadata': metadata}
+                )
+        except (ClientError, OSError) as e:
+            segments_shipped_total.labels(status="failed").inc()
+            logger.warning(f"Segment {segment.base_offset} not shipped (will retry): {e}")
+            return False
+        except Exception as e:
+            segments_shipped_total.labels(status="failed").inc()
+            logger.warning(f"Segment {segment.base_offset} not shipped (will retry): {e}")
+            return False
+
+        open(segment.shipped_path, "w").close()
+        segments_shipped_total.labels(status="shipped").inc()
+        return True
+
+    def _apply_retention(self):
+        if self.retention_bytes is None:
+            return
+        # Appends only grow the total, so a stale snapshot never deletes too much
+        total = self.log.total_bytes()
+        for segment in self.log.sealed_segments():
+            if total <= self.retention_bytes:
+                break
+            if segment.shipped:
+                total -= segment.size
+                self.log.remove(segment)
+
+
+def persistent_node_id(directory: str, default: Optional[str] = None) -> str:
+    """
+    The node id stored in a segment directory, created from default (or the
+    host name) on first use, so a restarted pod keeps shipping to the same
+    segments/<node_id>/ prefix
+    """
+    path = os.path.join(directory, NODE_ID_FILE)
+    try:
+        with open(path) as f:
+            node_id = f.read().strip()
+        if node_id:
+            return node_id
+    except FileNotFoundError:
+        pass
+
+    node_id = default or socket.gethostname()
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(node_id + "\n")
+    return node_id
+
+
+class LocalSegmentStorage(TelemetryStorage):
+    """
+    Stores envelopes and frames as records in a local segment log. Segments
+    are shipped under node_id, which defaults to the id persisted in the
+    segment directory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+        s3_client=None,
+        bucket_name: Optional[str] = None,
+        node_id: Optional[str] = None,
+        ship_interval: float = 30.0,
+        seal_after: float = 300.0,
+        retention_bytes: Optional[int] = None
+    ):
+        self.log = SegmentLog(directory, max_segment_bytes=max_segment_bytes, fsync_interval=fsync_interval)
+        self.shipper = SegmentShipper(
+            self.log,
+            s3_client=s3_client,
+            bucket_name=bucket_name,
+            node_id=node_id or persistent_node_id(directory),
+            flush_interval=ship_interval,
+            seal_after=seal_after,
+            retention_bytes=retention_bytes
+        )
+
+    def store_telemetry(self, telemetry) -> Optional[str]:
+        """Append a telemetry envelope as a compact JSON record"""
+        try:
+            timestamp = datetime.fromisoformat(telemetry.timestamp.replace('Z', '+00:00'))
+            key = self._partition_key(timestamp, telemetry.data_type, telemetry.edge_id, "json")
+            body = json.dumps(telemetry.model_dump(), separators=(",", ":")).encode("utf-8")
+            offset = self.log.append(KIND_JSON, key, body)
+            logger.info(f"Stored telemetry at offset {offset}: {key} (trace {telemetry.metadata.trace_id or '-'})")
+            return key
+        except Exception as e:
+            logger.error(f"Unexpected error storing telemetry: {e}")
+            return None
+
+    def store_frame(self, frame: DecodedFrame, trace_id: Optional[str] = None) -> Optional[str]:
+        """Append a binary sample frame as-is"""
+        try:
+            timestamp = datetime.fromtimestamp(frame.base_time_us / 1_000_000, tz=timezone.utc)
+            key = self._partition_key(timestamp, frame.data_type, frame.edge_id, "f1tf")
+            offset = self.log.append(KIND_FRAME, key, frame.raw)
+            logger.info(f"Stored {frame.sample_count} sample frame at offset {offset}: {key} (trace {trace_id or '-'})")
+            return key
+        except Exception as e:
+            logger.error(f"Unexpected error storing frame: {e}")
+            return None
+
+    def background_flushers(self) -> List[Tuple[str, Any]]:
+        flushers = [("Segment", self.shipper)]
+        if self.log.fsync_interval:
+            flushers.append(("Segment fsync", self.log))
+        return flushers
+
+    def close(self):
+        self.shipper.flush()
+        self.log.close()
+
+
+def export_path(root: str, key: str) -> Optional[str]:
+    """Path of a record key under the export root, or None if the key escapes it"""
+    path = os.path.realpath(os.path.join(root, os.path.normpath(key)))
+    if os.path.commonpath([root, path]) != root or path == root:
+        return None
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or export a local segment log")
+    parser.add_argument("directory", help="Segment directory (LOCAL_STORAGE_DIR)")
+    parser.add_argument("--from-offset", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--export", metavar="DIR",
+                        help="Write records as raw-telemetry/... objects under DIR (readable by analytics/local)")
+    args = parser.parse_args()
+
+    # Opening the log recovers the active segment, so only inspect a stopped service's directory
+    log = SegmentLog(args.directory)
+    export_root = os.path.realpath(args.export) if args.export else None
+    count = 0
+    for record in log.scan(args.from_offset):
+        if args.limit is not None and count >= args.limit:
+            break
+        if export_root:
+            path = export_path(export_root, record.key)
+            if path is None:
+                logger.warning(f"Skipping record {record.offset}: key {record.key!r} escapes {export_root}")
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(record.body)
+        else:
+            print(f"{record.offset}\t{KIND_EXTENSIONS.get(record.kind, record.kind)}\t{len(record.body)}\t{record.key}")
+        count += 1
+    log.close()
+    if args.export:
+        print(f"Exported {count} records to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
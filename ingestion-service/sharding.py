@@ -0,0 +1,232 @@
+"""
+F1 Telemetry Ingestion Service - Edge Affinity Sharding
+Consistent-hash ring on edge_id so each replica owns a stable subset of edges;
+requests that land on another replica are forwarded (or redirected) to the owner
+"""
+import time
+import bisect
+import random
+import socket
+import hashlib
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, List, Mapping, Optional, Set
+
+import requests
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Set on requests forwarded by a replica; the receiver handles them locally so
+# a request is forwarded at most once, even while replicas disagree on the ring
+FORWARDED_HEADER = "X-Shard-Forwarded"
+# Set on responses to sharded requests
+OWNER_HEADER = "X-Shard-Owner"
+# Request headers passed on to the owner
+FORWARD_HEADERS = ("Content-Type", "Content-Encoding", "X-Edge-ID", "X-Trace-ID", "X-Race-Mode")
+
+shard_requests_total = Counter(
+    'shard_requests_total',
+    'Per-edge requests by routing decision',
+    ['route']
+)
+
+shard_forward_duration = Histogram(
+    'shard_forward_duration_seconds',
+    'Time spent forwarding requests to the owning replica'
+)
+
+shard_ring_members = Gauge(
+    'shard_ring_members',
+    'Replicas in this replica\'s view of the shard ring'
+)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Immutable consistent-hash ring with virtual nodes. Adding or removing one
+    of N members moves about 1/N of the keys, all of them to or from that member.
+    """
+
+    def __init__(self, members: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self.members = frozenset(members)
+        points = sorted((_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        return self._owners[bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)]
+
+
+class ShardMap:
+    """
+    This replica's view of the ring. Members are base URLs
+    (http://10.0.3.7:8000): the static peers plus, with a DNS name (a headless
+    Service), every address it resolves to, re-resolved every refresh_interval.
+    The ring always includes this replica, and is swapped whole on change so
+    lookups need no lock.
+    """
+
+    def __init__(
+        self,
+        self_url: str,
+        peers: Iterable[str] = (),
+        dns_name: Optional[str] = None,
+        port: int = 8000,
+        vnodes: int = 64,
+        refresh_interval: float = 10.0,
+        mode: str = "forward",
+        forward_timeout: float = 10.0
+    ):
+        if mode not in ("forward", "redirect"):
+            raise ValueError(f"Unknown shard mode: {mode}")
+        self.self_url = self_url.rstrip("/")
+        self.peers = [peer.rstrip("/") for peer in peers]
+        self.dns_name = dns_name
+        self.port = port
+        self.vnodes = vnodes
+        self.refresh_interval = refresh_interval
+        self.mode = mode
+        self.forward_timeout = forward_timeout
+        # Pooled keep-alive connections to the other replicas
+        self.session = requests.Session()
+        self.ring = HashRing([self.self_url], vnodes)
+        self.refresh()
+
+    def discover(self) -> Set[str]:
+        members = set(self.peers)
+        if self.dns_name:
+            for info in socket.getaddrinfo(self.dns_name, self.port, type=socket.SOCK_STREAM):
+                address = info[4][0]
+                host = f"[{address}]" if ":" in address else address
+                members.add(f"http://{host}:{self.port}")
+        members.add(self.self_url)
+        return members
+
+    def refresh(self):
+        """Re-read membership; keeps the current ring if discovery fails"""
+        try:
+            members = self.discover()
+        except OSError as e:
+            logger.warning(f"Shard discovery failed, keeping {len(self.ring.members)} replicas: {e}")
+            return
+
+        if members != self.ring.members:
+            joined = members - self.ring.members
+            left = self.ring.members - members
+            self.ring = HashRing(members, self.vnodes)
+            logger.info(
+                f"🔀 Shard ring has {len(members)} replicas"
+                f" (joined: {sorted(joined) or '-'}, left: {sorted(left) or '-'})"
+            )
+        shard_ring_members.set(len(members))
+
+    def owner(self, edge_id: str) -> str:
+        return self.ring.owner(edge_id)
+
+    def forward(self, owner: str, path: str, query: str, headers: Mapping[str, str], body: bytes) -> requests.Response:
+        """POST a request on to its owner; raises requests.RequestException if the owner is unreachable"""
+        url = f"{owner}{path}?{query}" if query else f"{owner}{path}"
+        forward_headers = {name: headers[name] for name in FORWARD_HEADERS if headers.get(name)}
+        forward_headers[FORWARDED_HEADER] = self.self_url
+        with shard_forward_duration.time():
+            return self.session.post(url, data=body, headers=forward_headers, timeout=self.forward_timeout)
+
+
+def movement(before: HashRing, after: HashRing, keys: List[str]) -> float:
+    """Fraction of keys whose owner differs between two rings"""
+    return sum(before.owner(key) != after.owner(key) for key in keys) / len(keys)
+
+
+class _RouterHandler(BaseHTTPRequestHandler):
+    """Sends every request to a random backend, like a load balancer without affinity"""
+
+    backends: List[str] = []
+    session = requests.Session()
+
+    def _proxy(self, method: str):
+        backend = random.choice(self.backends)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in ("host", "content-length")}
+        try:
+            # Follows 307s from replicas in redirect mode, body and method preserved
+            response = self.session.request(method, backend + self.path, data=body, headers=headers, timeout=30)
+        except requests.RequestException as e:
+            self.send_error(502, f"{backend}: {e}")
+            return
+
+        self.send_response(response.status_code)
+        for name in ("Content-Type", OWNER_HEADER):
+            if name in response.headers:
+                self.send_header(name, response.headers[name])
+        self.send_header("Content-Length", str(len(response.content)))
+        self.end_headers()
+        self.wfile.write(response.content)
+
+    def do_GET(self):
+        self._proxy("GET")
+
+    def do_POST(self):
+        self._proxy("POST")
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard ring tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    ring_parser = subcommands.add_parser("ring", help="Show edge ownership and movement when replicas change")
+    ring_parser.add_argument("--replicas", type=int, default=3)
+    ring_parser.add_argument("--edges", type=int, default=10000)
+    ring_parser.add_argument("--vnodes", type=int, default=64)
+
+    router_parser = subcommands.add_parser("router", help="Random-routing stand-in for the ingress")
+    router_parser.add_argument("--port", type=int, default=8080)
+    router_parser.add_argument("--backends", required=True,
+                               help="Comma-separated replica URLs, e.g. http://127.0.0.1:8001,http://127.0.0.1:8002")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "ring":
+        edges = [f"edge-{i:05d}" for i in range(args.edges)]
+        members = [f"http://10.0.0.{i + 1}:8000" for i in range(args.replicas)]
+        ring = HashRing(members, args.vnodes)
+
+        started = time.perf_counter()
+        owners = [ring.owner(edge) for edge in edges]
+        elapsed = time.perf_counter() - started
+        print(f"{args.replicas} replicas, {args.vnodes} vnodes, {args.edges} edges ({elapsed / args.edges * 1e6:.1f} us/lookup)")
+        for member in members:
+            print(f"  {member}: {owners.count(member) / args.edges:.1%}")
+
+        grown = HashRing(members + [f"http://10.0.0.{args.replicas + 1}:8000"], args.vnodes)
+        print(f"scale up to {args.replicas + 1}: {movement(ring, grown, edges):.1%} of edges move "
+              f"(ideal {1 / (args.replicas + 1):.1%})")
+        if args.replicas > 1:
+            shrunk = HashRing(members[:-1], args.vnodes)
+            print(f"scale down to {args.replicas - 1}: {movement(ring, shrunk, edges):.1%} of edges move "
+                  f"(ideal {1 / args.replicas:.1%})")
+        return
+
+    _RouterHandler.backends = [backend.strip().rstrip("/") for backend in args.backends.split(",") if backend.strip()]
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), _RouterHandler)
+    logger.info(f"🔀 Routing :{args.port} randomly across {len(_RouterHandler.backends)} replicas")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+F1 Telemetry Ingestion Service - Storage Interface
+Pluggable sinks for ingested telemetry, selected with STORAGE_BACKEND, and the
+S3 backend (one object per message)
+"""
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+from prometheus_client import Histogram
+
+from frames import FRAME_CONTENT_TYPE, DecodedFrame
+from manifest import ManifestWriter
+from models import TelemetryPayload
+from rollups import RollupAggregator
+
+logger = logging.getLogger(__name__)
+
+s3_upload_duration = Histogram(
+    's3_upload_duration_seconds',
+    'Time spent uploading to S3',
+    ['bucket']
+)
+
+
+class TelemetryStorage(ABC):
+    """
+    Where ingested messages and frames are written. Implementations return the
+    partition key of the stored record, or None when it could not be stored.
+    """
+
+    # Optional ManifestWriter / RollupAggregator maintained by the backend
+    manifest = None
+    rollups = None
+
+    @staticmethod
+    def _partition_key(timestamp: datetime, data_type: str, edge_id: str, extension: str) -> str:
+        return (
+            f"raw-telemetry/"
+            f"year={timestamp.year}/"
+            f"month={timestamp.month:02d}/"
+            f"day={timestamp.day:02d}/"
+            f"data_type={data_type}/"
+            f"{edge_id}_{timestamp.isoformat()}.{extension}"
+        )
+
+    @abstractmethod
+    def store_telemetry(self, telemetry) -> Optional[str]:
+        """Store a validated TelemetryPayload envelope"""
+
+    @abstractmethod
+    def store_frame(self, frame: DecodedFrame, trace_id: Optional[str] = None) -> Optional[str]:
+        """Store a decoded binary sample frame"""
+
+    def background_flushers(self) -> List[Tuple[str, Any]]:
+        """
+        (name, flusher) pairs to run on a schedule; each flusher has
+        flush_interval, a flush_requested event and flush()
+        """
+        return []
+
+    def close(self):
+        """Final flush on shutdown"""
+
+
+def create_s3_client(region: str):
+    """S3 client for AWS, or for S3-compatible storage (MinIO) when S3_ENDPOINT_URL is set"""
+    # Check if using MinIO (local development)
+    s3_endpoint = os.environ.get("S3_ENDPOINT_URL")
+    aws_access_key = os.environ.get("AWS_ACCESS_KEY_ID", "minioadmin")
+    aws_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY", "minioadmin")
+
+    if s3_endpoint:
+        # MinIO configuration
+        logger.info(f"Using S3-compatible storage at: {s3_endpoint}")
+        return boto3.client(
+            's3',
+            endpoint_url=s3_endpoint,
+            aws_access_key_id=aws_access_key,
+            aws_secret_access_key=aws_secret_key,
+            region_name=region
+        )
+
+    # AWS S3 configuration
+    return boto3.client('s3', region_name=region)
+
+
+class S3Storage(TelemetryStorage):
+    """Handles S3 storage operations (supports both AWS S3 and MinIO)"""
+
+    def __init__(
+        self,
+        bucket_name: str,
+        region: str = "us-east-1",
+        manifest_enabled: bool = True,
+        rollups_enabled: bool = True
+    ):
+        self.bucket_name = bucket_name
+        self.region = region
+        self.s3_client = None
+        self.manifest: Optional[ManifestWriter] = None
+        self.rollups: Optional[RollupAggregator] = None
+
+        try:
+            self.s3_client = create_s3_client(region)
+            logger.info(f"Initialized S3 client for bucket: {bucket_name}")
+
+            if manifest_enabled:
+                self.manifest = ManifestWriter(
+                    self.s3_client,
+                    bucket_name,
+                    writer_id=os.environ.get("HOSTNAME", "ingestion"),
+                    flush_interval=float(os.environ.get("MANIFEST_FLUSH_INTERVAL", "30")),
+                    compact_interval=float(os.environ.get("MANIFEST_COMPACT_INTERVAL", "300"))
+                )
+
+            if rollups_enabled:
+                self.rollups = RollupAggregator(
+                    self.s3_client,
+                    bucket_name,
+                    writer_id=os.environ.get("HOSTNAME", "ingestion"),
+                    flush_interval=float(os.environ.get("ROLLUP_FLUSH_INTERVAL", "60"))
+                )
+        except Exception as e:
+            logger.error(f"Failed to initialize S3 client: {e}")
+
+    def store_telemetry(self, telemetry: TelemetryPayload) -> Optional[str]:
+        """Store telemetry data in S3"""
+        if not self.s3_client:
+            logger.error("S3 client not initialized")
+            return None
+
+        try:
+            # Generate S3 key with partitioning
+            timestamp = datetime.fromisoformat(telemetry.timestamp.replace('Z', '+00:00'))
+            s3_key = self._partition_key(timestamp, telemetry.data_type, telemetry.edge_id, "json")
+
+            body = json.dumps(telemetry.model_dump(), indent=2)
+
+            metadata = {
+                'edge_id': telemetry.edge_id,
+                'data_type': telemetry.data_type,
+                'collection_time': telemetry.metadata.collection_time
+            }
+            if telemetry.metadata.trace_id:
+                metadata['trace_id'] = telemetry.metadata.trace_id
+
+            # Upload to S3
+            with s3_upload_duration.labels(bucket=self.bucket_name).time():
+                response = self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=body,
+                    ContentType='application/json',
+                    Metadata=metadata
+                )
+
+            if self.manifest:
+                self.manifest.record(
+                    s3_key,
+                    records=1,
+                    nbytes=len(body.encode('utf-8')),
+                    min_ts=telemetry.timestamp,
+                    max_ts=telemetry.timestamp,
+                    etag=response.get('ETag', '')
+                )
+
+            if self.rollups:
+                self.rollups.observe(
+                    timestamp,
+                    telemetry.edge_id,
+                    telemetry.data_type,
+                    nbytes=len(body.encode('utf-8')),
+                    payload=telemetry.payload
+                )
+
+            logger.info(f"Stored telemetry in S3: {s3_key} (trace {telemetry.metadata.trace_id or '-'})")
+            return s3_key
+
+        except ClientError as e:
+            logger.error(f"S3 upload error: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error storing telemetry: {e}")
+            return None
+
+
+    def store_frame(self, frame: DecodedFrame, trace_id: Optional[str] = None) -> Optional[str]:
+        """Store a binary sample frame as-is (it is already column-packed)"""
+        if not self.s3_client:
+            logger.error("S3 client not initialized")
+            return None
+
+        try:
+            first_us, last_us = frame.time_range_us
+            timestamp = datetime.fromtimestamp(frame.base_time_us / 1_000_000, tz=timezone.utc)
+            s3_key = self._partition_key(timestamp, frame.data_type, frame.edge_id, "f1tf")
+
+            metadata = {
+                'edge_id': frame.edge_id,
+                'data_type': frame.data_type,
+                'schema_id': str(frame.schema_id),
+                'sample_count': str(frame.sample_count)
+            }
+            if trace_id:
+                metadata['trace_id'] = trace_id
+
+            with s3_upload_duration.labels(bucket=self.bucket_name).time():
+                response = self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=bytes(frame.raw),
+                    ContentType=FRAME_CONTENT_TYPE,
+                    Metadata=metadata
+                )
+
+            if self.manifest:
+                self.manifest.record(
+                    s3_key,
+                    records=frame.sample_count,
+                    nbytes=len(frame.raw),
+                    min_ts=datetime.fromtimestamp(first_us / 1_000_000, tz=timezone.utc).isoformat().replace("+00:00", "Z"),
+                    max_ts=datetime.fromtimestamp(last_us / 1_000_000, tz=timezone.utc).isoformat().replace("+00:00", "Z"),
+                    etag=response.get('ETag', '')
+                )
+
+            if self.rollups:
+                self.rollups.observe(
+                    timestamp,
+                    frame.edge_id,
+                    frame.data_type,
+                    nbytes=len(frame.raw),
+                    samples=frame.sample_count
+                )
+
+            logger.info(f"Stored {frame.sample_count} sample frame in S3: {s3_key} (trace {trace_id or '-'})")
+            return s3_key
+
+        except ClientError as e:
+            logger.error(f"S3 upload error: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error storing frame: {e}")
+            return None
+
+    def background_flushers(self):
+        return [
+            (name, flusher)
+            for name, flusher in (("Manifest", self.manifest), ("Rollup", self.rollups))
+            if flusher
+        ]
+
+    def close(self):
+        if self.manifest:
+            self.manifest.flush(final=True)
+        if self.rollups:
+            self.rollups.flush(final=True)
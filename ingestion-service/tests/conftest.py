@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The service modules are flat scripts (imported as `frames`, `segments`, ...);
+# frame_codec is the edge simulator's encoder for the same wire format
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "edge-simulator"))
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from frame_codec import FRAME_SCHEMAS as CODEC_SCHEMAS, encode_frame, header_size
+from frames import FRAME_SCHEMAS, FRAME_HEADER, FrameFormatError, decode_frames
+from telemetry_generator import TelemetryFrame
+
+
+def make_frame(count: int, base_time: float = 1_714_900_000.25) -> TelemetryFrame:
+    rng = np.random.default_rng(count)
+    channels = {
+        "lat": rng.uniform(-90, 90, count),
+        "lon": rng.uniform(-180, 180, count),
+        "t_us": np.arange(count, dtype=np.uint32) * 100_000,
+        "distance": rng.uniform(0, 5000, count),
+        "speed": rng.uniform(0, 340, count),
+        "lap": rng.integers(1, 70, count),
+        "rpm": rng.integers(4000, 15000, count),
+        "car": rng.integers(0, 20, count),
+        "throttle": rng.integers(0, 100, count),
+        "brake": rng.integers(0, 100, count),
+        "gear": rng.integers(-1, 9, count),
+        "drs": rng.integers(0, 2, count),
+    }
+    return TelemetryFrame(base_time=base_time, rate_hz=10.0, car_ids=[], channels=channels)
+
+
+def test_schemas_match():
+    for schema_id, schema in CODEC_SCHEMAS.items():
+        assert FRAME_SCHEMAS[schema_id][1] == schema
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 200])
+@pytest.mark.parametrize("edge_id", ["e", "edge-silverstone-01", "édge-ü"])
+def test_round_trip(count, edge_id):
+    frame = make_frame(count)
+    body = encode_frame(frame, edge_id)
+
+    [decoded] = decode_frames(body)
+
+    assert decoded.edge_id == edge_id
+    assert decoded.data_type == "car_telemetry"
+    assert decoded.sample_count == count
+    assert decoded.base_time_us == round(frame.base_time * 1_000_000)
+    assert bytes(decoded.raw) == body
+    for name, dtype in FRAME_SCHEMAS[1][1]:
+        expected = np.asarray(frame.channels[name], dtype=dtype)
+        np.testing.assert_array_equal(decoded.columns[name], expected)
+    if count:
+        assert decoded.time_range_us == (decoded.base_time_us, decoded.base_time_us + (count - 1) * 100_000)
+
+
+def test_concatenated_frames():
+    frames = [make_frame(3), make_frame(50, base_time=1_714_900_001.0), make_frame(0)]
+    body = b"".join(encode_frame(frame, f"edge-{i}") for i, frame in enumerate(frames))
+
+    decoded = decode_frames(body)
+
+    assert [frame.edge_id for frame in decoded] == ["edge-0", "edge-1", "edge-2"]
+    assert [frame.sample_count for frame in decoded] == [3, 50, 0]
+    assert b"".join(bytes(frame.raw) for frame in decoded) == body
+
+
+def test_header_is_padded_to_eight_bytes():
+    for length in range(0, 40):
+        assert header_size(length) % 8 == 0
+        assert header_size(length) >= FRAME_HEADER.size + length
+
+
+@pytest.mark.parametrize("cut", [1, FRAME_HEADER.size - 1, FRAME_HEADER.size + 30, -1])
+def test_truncated(cut):
+    body = encode_frame(make_frame(10), "edge-1")
+    with pytest.raises(FrameFormatError):
+        decode_frames(body[:cut])
+
+
+def test_bad_magic_and_version():
+    body = bytearray(encode_frame(make_frame(2), "edge-1"))
+    with pytest.raises(FrameFormatError, match="magic"):
+        decode_frames(b"XXXX" + bytes(body[4:]))
+    body[4] = 99
+    with pytest.raises(FrameFormatError, match="version"):
+        decode_frames(bytes(body))
+
+
+def test_non_utf8_edge_id():
+    body = bytearray(encode_frame(make_frame(2), "edge-1"))
+    body[FRAME_HEADER.size] = 0xFF
+    with pytest.raises(FrameFormatError, match="UTF-8"):
+        decode_frames(bytes(body))
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manifest import MANIFEST_NAME, ManifestWriter, rows_to_entries
+
+PARTITION = "raw-telemetry/year=2025/month=12/day=31/data_type=lap_times/"
+
+
+class ConditionalS3:
+    """In-memory bucket with S3 conditional-write semantics"""
+
+    def __init__(self):
+        self.objects = {}
+        self.gets = []
+        self.failing = False
+
+    @staticmethod
+    def _etag(body):
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def get_object(self, Bucket, Key):
+        self.gets.append(Key)
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        body = self.objects[Key]
+        return {"Body": io.BytesIO(body), "ETag": self._etag(body)}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kwargs):
+        if self.failing:
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+        current = self.objects.get(Key)
+        if (IfNoneMatch == "*" and current is not None) or (IfMatch and (current is None or self._etag(current) != IfMatch)):
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.objects[Key] = Body.encode() if isinstance(Body, str) else bytes(Body)
+        return {"ETag": self._etag(self.objects[Key])}
+
+    def get_paginator(self, operation):
+        bucket = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                keys = sorted(key for key in bucket.objects if key.startswith(Prefix))
+                yield {"Contents": [{"Key": key, "ETag": bucket._etag(bucket.objects[key])} for key in keys]}
+
+        return Paginator()
+
+
+def record(writer, name, hour="12"):
+    ts = f"2025-12-31T{hour}:00:00Z"
+    writer.record(f"{PARTITION}{name}", records=1, nbytes=100, min_ts=ts, max_ts=ts, etag=f'"{name}-etag"')
+
+
+def manifest(s3):
+    return json.loads(s3.objects[f"{PARTITION}{MANIFEST_NAME}"])
+
+
+def test_flush_writes_shards_and_compacts_on_final():
+    s3 = ConditionalS3()
+    writer = ManifestWriter(s3, "bucket", "writer-a")
+    record(writer, "a.json")
+    record(writer, "b.json", hour="13")
+
+    assert writer.flush() == 2
+    assert f"{PARTITION}{MANIFEST_NAME}" not in s3.objects
+
+    writer.flush(final=True)
+    entries = rows_to_entries(manifest(s3))
+    assert sorted(entries) == ["a.json", "b.json"]
+    assert entries["a.json"][4] == "a.json-etag"
+    assert len(manifest(s3)["shards"]) == 2
+
+
+def test_compaction_merges_writers_and_reads_only_changed_shards():
+    s3 = ConditionalS3()
+    first, second = ManifestWriter(s3, "bucket", "writer-a"), ManifestWriter(s3, "bucket", "writer-b")
+    record(first, "a.json")
+    record(second, "b.json")
+    first.flush()
+    second.flush(final=True)
+    assert sorted(rows_to_entries(manifest(s3))) == ["a.json", "b.json"]
+    assert manifest(s3)["totals"]["records"] == 2
+
+    record(first, "c.json")
+    first.flush()
+    s3.gets.clear()
+    assert first.compact(PARTITION)
+
+    shard_reads = [key for key in s3.gets if "/_manifest/" in key]
+    assert shard_reads == [f"{PARTITION}_manifest/writer-a/hour=12.json"]
+    assert sorted(rows_to_entries(manifest(s3))) == ["a.json", "b.json", "c.json"]
+
+
+def test_compaction_waits_for_interval():
+    s3 = ConditionalS3()
+    writer = ManifestWriter(s3, "bucket", "writer-a", compact_interval=0.0)
+    record(writer, "a.json")
+    writer.flush()
+    assert sorted(rows_to_entries(manifest(s3))) == ["a.json"]
+
+
+@pytest.mark.parametrize("attempts", [1, 3])
+def test_failed_entries_are_dropped_after_retry_limit(attempts):
+    s3 = ConditionalS3()
+    writer = ManifestWriter(s3, "bucket", "writer-a", max_flush_attempts=attempts)
+    record(writer, "a.json")
+    s3.failing = True
+
+    for _ in range(attempts - 1):
+        assert writer.flush() == 0
+        assert writer._pending_count == 1
+    assert writer.flush() == 0
+    assert writer._pending_count == 0
+    assert not writer._failures
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from segments import (
+    INDEX_ENTRY, KIND_FRAME, KIND_JSON, MAX_SEGMENT_BYTES, RECORD_HEADER, SegmentLog, SegmentShipper, export_path,
+    persistent_node_id
+)
+
+
+def append_records(log: SegmentLog, count: int, start: int = 0):
+    return [log.append(KIND_JSON, f"key-{i}", f'{{"n":{i}}}'.encode()) for i in range(start, start + count)]
+
+
+def test_append_and_read(tmp_path):
+    log = SegmentLog(str(tmp_path), fsync_interval=0)
+    offsets = append_records(log, 5)
+    frame_offset = log.append(KIND_FRAME, "frame", b"\x00\x01" * 10)
+
+    assert offsets == [0, 1, 2, 3, 4]
+    record = log.read(3)
+    assert (record.kind, record.key, bytes(record.body)) == (KIND_JSON, "key-3", b'{"n":3}')
+    assert bytes(log.read(frame_offset).body) == b"\x00\x01" * 10
+    with pytest.raises(KeyError):
+        log.read(frame_offset + 1)
+    log.close()
+
+
+def test_recovery_after_truncated_write(tmp_path):
+    log = SegmentLog(str(tmp_path))
+    append_records(log, 10)
+    log.close()
+
+    # A crash mid-append leaves part of a record behind
+    segment_path = log.active.log_path
+    good_size = os.path.getsize(segment_path)
+    with open(segment_path, "ab") as f:
+        f.write(RECORD_HEADER.pack(100, 0, KIND_JSON, 5) + b"key-1" + b"partial")
+
+    recovered = SegmentLog(str(tmp_path))
+
+    assert recovered.next_offset == 10
+    assert os.path.getsize(segment_path) == good_size
+    assert os.path.getsize(recovered.active.index_path) == 10 * INDEX_ENTRY.size
+    assert [record.key for record in recovered.scan()] == [f"key-{i}" for i in range(10)]
+    # Appends continue at the truncation point
+    assert recovered.append(KIND_JSON, "after", b"{}") == 10
+    assert recovered.read(10).key == "after"
+    recovered.close()
+
+
+def test_recovery_drops_corrupt_tail(tmp_path):
+    log = SegmentLog(str(tmp_path))
+    append_records(log, 3)
+    log.close()
+
+    # Flip a byte in the last record's body: its CRC no longer matches
+    with open(log.active.log_path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    recovered = SegmentLog(str(tmp_path))
+    assert recovered.next_offset == 2
+    recovered.close()
+
+
+def test_recovery_keeps_sealed_segments(tmp_path):
+    log = SegmentLog(str(tmp_path), max_segment_bytes=256)
+    append_records(log, 40)
+    sealed = len(log.sealed_segments())
+    log.close()
+
+    recovered = SegmentLog(str(tmp_path), max_segment_bytes=256)
+    assert sealed > 1
+    assert len(recovered.sealed_segments()) == sealed
+    assert recovered.next_offset == 40
+    assert [record.key for record in recovered.scan(35)] == [f"key-{i}" for i in range(35, 40)]
+    recovered.close()
+
+
+def test_views_survive_remap(tmp_path):
+    log = SegmentLog(str(tmp_path))
+    append_records(log, 1)
+    held = log.read(0).body
+
+    # Growing the active segment remaps it while a view of the old mapping is held
+    append_records(log, 50, start=1)
+    assert log.read(50).key == "key-50"
+    assert bytes(held) == b'{"n":0}'
+    log.close()
+
+
+def test_retention_only_removes_shipped(tmp_path):
+    log = SegmentLog(str(tmp_path), max_segment_bytes=256)
+    append_records(log, 40)
+    sealed = log.sealed_segments()
+    for segment in sealed[:2]:
+        open(segment.shipped_path, "w").close()
+
+    SegmentShipper(log, retention_bytes=0).flush()
+
+    remaining = log.sealed_segments()
+    assert sealed[0] not in remaining and sealed[1] not in remaining
+    assert all(segment in remaining for segment in sealed[2:])
+    log.close()
+
+
+def test_persistent_node_id(tmp_path):
+    assert persistent_node_id(str(tmp_path), "pi-node-1") == "pi-node-1"
+    # A restarted pod with a new name keeps the stored id
+    assert persistent_node_id(str(tmp_path), "ingestion-service-5c8f-xk2lp") == "pi-node-1"
+
+
+def test_segment_size_fits_index_entries(tmp_path):
+    with pytest.raises(ValueError):
+        SegmentLog(str(tmp_path), max_segment_bytes=MAX_SEGMENT_BYTES + 1)
+    with pytest.raises(ValueError):
+        SegmentLog(str(tmp_path), max_segment_bytes=0)
+    SegmentLog(str(tmp_path), max_segment_bytes=MAX_SEGMENT_BYTES).close()
+
+
+def test_export_path_stays_under_root(tmp_path):
+    root = str(tmp_path)
+    key = "raw-telemetry/year=2025/month=12/day=31/data_type=lap_times/edge_2025-12-31T12:00:00.json"
+    assert export_path(root, key) == os.path.join(root, key)
+    for key in ("../escaped.json", "raw-telemetry/../../escaped.json", "/etc/passwd", "", "."):
+        assert export_path(root, key) is None
@@ -0,0 +1,49 @@
+from collections import Counter
+
+from sharding import HashRing, ShardMap, movement
+
+EDGES = [f"edge-{i:05d}" for i in range(5000)]
+MEMBERS = [f"http://10.0.0.{i}:8000" for i in range(1, 5)]
+
+
+def test_owner_is_deterministic_and_order_independent():
+    ring = HashRing(MEMBERS)
+    reordered = HashRing(reversed(MEMBERS))
+    assert [ring.owner(edge) for edge in EDGES] == [reordered.owner(edge) for edge in EDGES]
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().owner("edge-00001") is None
+
+
+def test_load_is_balanced():
+    counts = Counter(HashRing(MEMBERS).owner(edge) for edge in EDGES)
+    assert set(counts) == set(MEMBERS)
+    for count in counts.values():
+        assert 0.5 / len(MEMBERS) < count / len(EDGES) < 1.5 / len(MEMBERS)
+
+
+def test_adding_a_member_only_moves_edges_to_it():
+    before = HashRing(MEMBERS)
+    joined = "http://10.0.0.9:8000"
+    after = HashRing(MEMBERS + [joined])
+
+    moved = [edge for edge in EDGES if before.owner(edge) != after.owner(edge)]
+    assert all(after.owner(edge) == joined for edge in moved)
+    assert movement(before, after, EDGES) < 2 / (len(MEMBERS) + 1)
+
+
+def test_removing_a_member_only_moves_its_edges():
+    before = HashRing(MEMBERS)
+    left = MEMBERS[-1]
+    after = HashRing(MEMBERS[:-1])
+
+    moved = [edge for edge in EDGES if before.owner(edge) != after.owner(edge)]
+    assert moved
+    assert all(before.owner(edge) == left for edge in moved)
+
+
+def test_shard_map_always_includes_itself():
+    shard_map = ShardMap("http://10.0.0.1:8000/", peers=["http://10.0.0.2:8000/"])
+    assert shard_map.ring.members == {"http://10.0.0.1:8000", "http://10.0.0.2:8000"}
+    assert shard_map.owner("edge-00001") in shard_map.ring.members
@@ -146,6 +146,41 @@ handle_images() {
     fi
 }
 
+# Configure shipping of sealed segments to cloud S3
+configure_s3() {
+    echo ""
+    echo "Configuring cloud S3..."
+
+    if [ -z "$S3_BUCKET_NAME" ]; then
+        read -p "S3 bucket for telemetry segments (e.g. f1-telemetry-dev-raw-telemetry, empty to keep segments on the Pi): " S3_BUCKET_NAME
+    fi
+
+    if [ -z "$S3_BUCKET_NAME" ]; then
+        S3_BUCKET_NAME=unused
+        SEGMENT_SHIP_ENABLED=false
+    else
+        SEGMENT_SHIP_ENABLED=true
+        if [ -z "$AWS_ACCESS_KEY_ID" ]; then
+            read -p "AWS access key id: " AWS_ACCESS_KEY_ID
+        fi
+        if [ -z "$AWS_SECRET_ACCESS_KEY" ]; then
+            read -s -p "AWS secret access key: " AWS_SECRET_ACCESS_KEY
+            echo
+        fi
+    fi
+
+    kubectl create secret generic ingestion-secrets \
+        --from-literal=aws_access_key_id="$AWS_ACCESS_KEY_ID" \
+        --from-literal=aws_secret_access_key="$AWS_SECRET_ACCESS_KEY" \
+        --dry-run=client -o yaml | kubectl apply -f -
+
+    if [ "$SEGMENT_SHIP_ENABLED" = "true" ]; then
+        print_status "Segments will be shipped to s3://$S3_BUCKET_NAME/segments/"
+    else
+        print_warning "No bucket given: segments stay on the Pi"
+    fi
+}
+
 # Deploy Kubernetes resources
 deploy_resources() {
     echo ""
@@ -154,10 +189,6 @@ deploy_resources() {
     cd "$(dirname "$0")/k8s"
 
     # Deploy in order
-    echo "Deploying MinIO..."
-    kubectl apply -f minio.yaml
-    print_status "MinIO deployed"
-
     echo "Deploying Prometheus..."
     kubectl apply -f prometheus.yaml
     print_status "Prometheus deployed"
@@ -175,7 +206,9 @@ deploy_resources() {
     print_status "Grafana deployed"
 
     echo "Deploying Ingestion Service..."
-    kubectl apply -f ingestion-service.yaml
+    sed -e "s|<S3_BUCKET_NAME>|$S3_BUCKET_NAME|" \
+        -e "s|<SEGMENT_SHIP_ENABLED>|$SEGMENT_SHIP_ENABLED|" \
+        ingestion-service.yaml | kubectl apply -f -
     print_status "Ingestion Service deployed"
 
     echo "Deploying Edge Simulator..."
@@ -206,7 +239,6 @@ show_access_info() {
     echo "Access URLs (from this Pi):"
     echo "  Grafana:    http://localhost:30030 (admin/admin)"
     echo "  Prometheus: http://localhost:30090"
-    echo "  MinIO:      http://localhost:30901 (minioadmin/minioadmin)"
     echo ""
     echo "Next steps:"
     echo "  1. Test locally: curl http://localhost:30030"
@@ -229,6 +261,7 @@ main() {
     install_k3s
     check_k3s
     handle_images
+    configure_s3
     deploy_resources
     wait_for_pods
     show_access_info